@@ -0,0 +1,99 @@
+"""Benchmark: legacy db.query() lookups vs prebuilt AuthQueries statements,
+and first-lookup latency with and without init-time warm-up.
+
+Run from the repo root with viv-auth installed (pip install -e .):
+
+    python benchmarks/bench_queries.py
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+import timeit
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from viv_auth.models import create_auth_models
+from viv_auth.queries import AuthQueries
+
+USERS = 1000
+N = 20_000
+
+
+def bench(label: str, fn):
+    seconds = min(timeit.repeat(fn, number=N, repeat=5))
+    print(f"  {label:<44} {seconds / N * 1e6:7.2f} us/op")
+
+
+def steady_state():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base = declarative_base()
+    User, MagicToken, ApiKey = create_auth_models(Base)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    for i in range(USERS):
+        db.add(User(email=f"user{i}@example.com"))
+    db.flush()
+    db.add(ApiKey.create(1, "bench", "gbox_pk_bench"))
+    db.commit()
+    queries = AuthQueries(User, MagicToken, ApiKey)
+    key_hash = hashlib.sha256(b"gbox_pk_bench").hexdigest()
+
+    print("Steady state (in-memory SQLite, warm session)")
+    bench("user by id: db.query().filter().first()", lambda: db.query(User).filter(User.id == 500).first())
+    bench("user by id: prebuilt select()", lambda: db.scalars(queries.user_by_id, {"user_id": 500}).first())
+    bench(
+        "api key by hash: db.query().filter().first()",
+        lambda: db.query(ApiKey).filter(ApiKey.key_hash == key_hash, ApiKey.revoked_at.is_(None)).first(),
+    )
+    bench(
+        "api key by hash: prebuilt select()",
+        lambda: db.scalars(queries.api_key_by_hash, {"key_hash": key_hash}).first(),
+    )
+
+
+def first_lookup(warm: bool) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base = declarative_base()
+        User, MagicToken, ApiKey = create_auth_models(Base)
+        Base.metadata.create_all(engine)
+        engine.dispose()
+        SessionLocal = sessionmaker(bind=engine)
+
+        def get_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        queries = AuthQueries(User, MagicToken, ApiKey)
+        if warm:
+            queries.warm_up([get_db], connections=2)
+
+        start = time.perf_counter()
+        db = next(get_db())
+        db.scalars(queries.user_by_id, {"user_id": 1}).first()
+        db.scalars(queries.api_key_by_hash, {"key_hash": "x"}).first()
+        db.close()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+        return elapsed
+
+
+def cold_start():
+    runs = 20
+    cold = sorted(first_lookup(False) for _ in range(runs))[runs // 2]
+    warm = sorted(first_lookup(True) for _ in range(runs))[runs // 2]
+    print("First request after startup (file SQLite, median of 20)")
+    print(f"  {'without warm-up':<44} {cold * 1e6:7.0f} us")
+    print(f"  {'with warm_up_connections=2':<44} {warm * 1e6:7.0f} us")
+
+
+if __name__ == "__main__":
+    steady_state()
+    cold_start()
@@ -0,0 +1,50 @@
+"""Microbenchmark: itsdangerous vs compact session cookies.
+
+Run from the repo root with viv-auth installed (pip install -e .):
+
+    python benchmarks/bench_session.py
+"""
+
+import timeit
+
+from itsdangerous import URLSafeTimedSerializer
+
+from viv_auth.session import CompactSessionCodec, SessionManager
+
+SECRET = "bench-secret"
+N = 50_000
+
+
+def bench(label: str, fn):
+    seconds = min(timeit.repeat(fn, number=N, repeat=5))
+    print(f"  {label:<40} {seconds / N * 1e6:7.2f} us/op")
+
+
+def main():
+    raw = URLSafeTimedSerializer(SECRET)
+    compact = CompactSessionCodec(SECRET)
+    legacy_manager = SessionManager(SECRET, codec="itsdangerous")
+    compact_manager = SessionManager(SECRET, codec="compact")
+
+    raw_token = raw.dumps({"user_id": 123456})
+    compact_token = compact.dumps(123456)
+    legacy_cookie = legacy_manager.create_session(123456)
+    compact_cookie = compact_manager.create_session(123456)
+
+    print("Codec only")
+    bench("URLSafeTimedSerializer.dumps", lambda: raw.dumps({"user_id": 123456}))
+    bench("CompactSessionCodec.dumps", lambda: compact.dumps(123456))
+    bench("URLSafeTimedSerializer.loads", lambda: raw.loads(raw_token, max_age=604800))
+    bench("CompactSessionCodec.loads", lambda: compact.loads(compact_token, 604800))
+
+    print("SessionManager.verify_session")
+    bench("codec=itsdangerous", lambda: legacy_manager.verify_session(legacy_cookie))
+    bench("codec=compact", lambda: compact_manager.verify_session(compact_cookie))
+
+    print("Cookie length")
+    print(f"  {'itsdangerous':<40} {len(legacy_cookie):7d} chars")
+    print(f"  {'compact':<40} {len(compact_cookie):7d} chars")
+
+
+if __name__ == "__main__":
+    main()
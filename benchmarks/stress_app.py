@@ -0,0 +1,41 @@
+"""App served by benchmarks/stress_auth.py in each uvicorn worker.
+
+Configured from the environment: STRESS_DB is the SQLite file shared by all
+workers (schema and seed data are created by the harness beforehand), and
+SESSION_SECRET / GDEV_API_TOKEN are set by the harness.
+"""
+
+import os
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from viv_auth import AuthConfig, init_auth
+
+engine = create_engine(f"sqlite:///{os.environ['STRESS_DB']}", connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(bind=engine)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+Base = declarative_base()
+app = FastAPI()
+User, require_auth = init_auth(
+    app, engine, Base, get_db,
+    app_name="Stress",
+    app_url="http://stress.local",
+    config=AuthConfig(allow_signup=True),
+    enable_api_keys=True,
+)
+
+
+@app.get("/me")
+async def me(user=Depends(require_auth)):
+    return {"id": user.id}
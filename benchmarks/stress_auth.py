@@ -0,0 +1,321 @@
+"""Stress harness: several uvicorn workers sharing one file-backed SQLite
+database, driven with mixed login / verify / API-key traffic at increasing
+concurrency.
+
+Run from the repo root with the dev extras installed (pip install -e '.[dev]'):
+
+    python benchmarks/stress_auth.py --workers 4 --levels 1,8,32,64 --duration 10
+
+For each concurrency level it reports throughput, latency, error counts and
+these invariant violations:
+
+  double   one magic token accepted by both of two concurrent verifies
+  apiusr   duplicate api@system.local inserts: the row is deleted before
+           each level so the first GDEV-token requests race to create it,
+           and each losing insert fails the users.email unique index
+           ("UNIQUE constraint failed" in the workers' log)
+  locked   5xx responses caused by SQLite "database is locked", counted
+           from the workers' log
+
+Log errors are counted once per traceback, from its final
+sqlalchemy.exc line (the chained sqlite3 error is not counted again).
+
+Each op's latency covers the whole op: a verify op is a login plus two
+concurrent verifies of the issued token.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from viv_auth.models import create_auth_models
+
+BENCH_DIR = Path(__file__).parent
+API_TOKEN = "stress-gdev-token"
+API_USER_EMAIL = "api@system.local"
+OP_WEIGHTS = {"login": 3, "verify": 2, "api_key": 4, "api_token": 1}
+
+
+def email_for(i: int) -> str:
+    return f"stress{i}@example.com"
+
+
+def api_key_for(i: int) -> str:
+    return f"gbox_pk_stress{i:08d}"
+
+
+def prepare_db(path: str, users: int, wal: bool):
+    """Create the schema and seed users 1..users, each with one API key."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base = declarative_base()
+    User, MagicToken, ApiKey = create_auth_models(Base)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all(User(id=i, email=email_for(i)) for i in range(1, users + 1))
+    db.flush()
+    db.add_all(ApiKey.create(i, "stress", api_key_for(i)) for i in range(1, users + 1))
+    db.commit()
+    db.close()
+    engine.dispose()
+    if wal:
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+
+
+def start_server(args, db_path: str, log_file):
+    env = dict(os.environ, STRESS_DB=db_path, SESSION_SECRET="stress-secret", GDEV_API_TOKEN=API_TOKEN)
+    env.pop("RESEND_API_KEY", None)  # never send real email
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "stress_app:app",
+            "--app-dir", str(BENCH_DIR),
+            "--host", "127.0.0.1",
+            "--port", str(args.port),
+            "--workers", str(args.workers),
+            "--log-level", "warning",
+            "--no-access-log",
+        ],
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {proc.returncode}, see {log_file.name}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{args.port}/auth/login").status_code == 200:
+                return proc
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start within 30s")
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.double_redeemed = 0
+
+    def record(self, op: str, seconds: float, error: str | None = None):
+        with self.lock:
+            self.latencies[op].append(seconds)
+            if error is not None:
+                self.errors[error] += 1
+
+
+class Driver:
+    """One load-generating thread, with its own clients and RNG."""
+
+    def __init__(self, args, db_path: str, stats: Stats, seed: int):
+        base_url = f"http://127.0.0.1:{args.port}"
+        # A new connection per request: kept-alive connections to multi-worker
+        # uvicorn hit ~40ms delayed-ACK stalls on loopback, which would swamp
+        # the auth paths being measured.
+        limits = httpx.Limits(max_keepalive_connections=0)
+        self.client = httpx.Client(base_url=base_url, timeout=args.timeout, limits=limits)
+        self.partner = httpx.Client(base_url=base_url, timeout=args.timeout, limits=limits)
+        self.db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.users = args.users
+        self.stats = stats
+        self.rng = random.Random(seed)
+        self.ops = list(OP_WEIGHTS)
+        self.weights = list(OP_WEIGHTS.values())
+
+    def close(self):
+        self.client.close()
+        self.partner.close()
+        self.db.close()
+
+    def run(self, deadline: float):
+        while time.monotonic() < deadline:
+            op = self.rng.choices(self.ops, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                error = getattr(self, op)()
+            except httpx.TransportError as exc:
+                error = f"{op}: {type(exc).__name__}"
+            self.stats.record(op, time.perf_counter() - start, error)
+
+    def _status_error(self, op: str, response, expected: int) -> str | None:
+        if response.status_code >= 500:
+            return f"{op}: 5xx"
+        if response.status_code != expected:
+            return f"{op}: HTTP {response.status_code}"
+        return None
+
+    def login(self, user: int | None = None) -> str | None:
+        user = user or self.rng.randint(1, self.users)
+        response = self.client.post("/auth/login", data={"email": email_for(user)})
+        return self._status_error("login", response, 200)
+
+    def verify(self) -> str | None:
+        user = self.rng.randint(1, self.users)
+        error = self.login(user)
+        if error is not None:
+            return error
+        row = self.db.execute(
+            "SELECT token FROM magic_tokens WHERE user_id = ? AND used = 0 ORDER BY id DESC LIMIT 1",
+            (user,),
+        ).fetchone()
+        if row is None:
+            # Another thread redeemed this user's latest token in between.
+            return None
+
+        url = f"/auth/verify?token={row[0]}"
+        barrier = threading.Barrier(2)
+        results = [None, None]
+
+        def redeem(slot: int, client: httpx.Client):
+            barrier.wait()
+            try:
+                results[slot] = client.get(url, follow_redirects=False)
+            except httpx.TransportError:
+                pass
+
+        partner = threading.Thread(target=redeem, args=(1, self.partner))
+        partner.start()
+        redeem(0, self.client)
+        partner.join()
+        self.client.cookies.clear()
+        self.partner.cookies.clear()
+
+        if any(r is None or r.status_code >= 500 for r in results):
+            return "verify: 5xx"
+        accepted = sum(r.status_code == 303 and r.headers.get("location") == "/" for r in results)
+        if accepted > 1:
+            with self.stats.lock:
+                self.stats.double_redeemed += 1
+        return None
+
+    def api_key(self) -> str | None:
+        key = api_key_for(self.rng.randint(1, self.users))
+        response = self.client.get("/me", headers={"authorization": f"Bearer {key}"})
+        return self._status_error("api_key", response, 200)
+
+    def api_token(self) -> str | None:
+        response = self.client.get("/me", headers={"authorization": f"Bearer {API_TOKEN}"})
+        return self._status_error("api_token", response, 200)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def count_log_errors(log: bytes) -> tuple[int, int]:
+    """Count (database is locked, duplicate api user) errors in worker log output."""
+    locked = duplicate_api_user = 0
+    for line in log.splitlines():
+        if not line.startswith(b"sqlalchemy.exc."):
+            continue
+        if b"database is locked" in line:
+            locked += 1
+        elif b"UNIQUE constraint failed: users.email" in line:
+            duplicate_api_user += 1
+    return locked, duplicate_api_user
+
+
+def run_level(args, db_path: str, log_path: Path, concurrency: int, seed: int) -> dict:
+    with sqlite3.connect(db_path, timeout=30) as conn:
+        conn.execute("DELETE FROM users WHERE email = ?", (API_USER_EMAIL,))
+    log_offset = log_path.stat().st_size
+
+    stats = Stats()
+    drivers = [Driver(args, db_path, stats, seed * 1000 + i) for i in range(concurrency)]
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=d.run, args=(deadline,)) for d in drivers]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    for d in drivers:
+        d.close()
+
+    time.sleep(0.2)  # let workers flush their logs
+    with open(log_path, "rb") as f:
+        f.seek(log_offset)
+        locked, duplicate_api_user = count_log_errors(f.read())
+
+    return {
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "stats": stats,
+        "locked": locked,
+        "duplicate_api_user": duplicate_api_user,
+    }
+
+
+def report(result: dict):
+    stats = result["stats"]
+    ops = sum(len(v) for v in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    server_errors = sum(n for kind, n in stats.errors.items() if kind.endswith("5xx"))
+    print(
+        f"{result['concurrency']:>5} {ops / result['elapsed']:>9.1f} {errors:>7} {server_errors:>6} "
+        f"{result['locked']:>7} {stats.double_redeemed:>7} {result['duplicate_api_user']:>7}"
+    )
+    for op in OP_WEIGHTS:
+        latencies = stats.latencies.get(op, [])
+        if latencies:
+            print(
+                f"      {op:<10} n={len(latencies):<7} p50={percentile(latencies, 0.5) * 1000:7.1f}ms "
+                f"p99={percentile(latencies, 0.99) * 1000:7.1f}ms"
+            )
+    for kind, n in stats.errors.most_common():
+        print(f"      ! {kind}: {n}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn worker processes")
+    parser.add_argument("--levels", default="1,4,16,32", help="comma-separated client thread counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--users", type=int, default=200, help="seeded users (each with an API key)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--wal", action="store_true", help="put the SQLite database in WAL mode")
+    parser.add_argument("--db", help="new SQLite file to create (default: a temporary file)")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+    if args.db and os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "stress.db")
+        prepare_db(db_path, args.users, args.wal)
+        log_path = Path(tmp) / "uvicorn.log"
+        with open(log_path, "wb") as log_file:
+            proc = start_server(args, db_path, log_file)
+            try:
+                print(
+                    f"{args.workers} workers, {args.users} users, {args.duration:g}s per level, "
+                    f"journal={'wal' if args.wal else 'delete'}"
+                )
+                print(f"{'conc':>5} {'ops/s':>9} {'errors':>7} {'5xx':>6} {'locked':>7} {'double':>7} {'apiusr':>7}")
+                for seed, concurrency in enumerate(levels):
+                    report(run_level(args, db_path, log_path, concurrency, seed))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,36 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from viv_auth import init_auth, AuthConfig
+from viv_auth.session import COOKIE_NAME, SessionManager
+
+TEST_SECRET = "test-secret"
+
+
+class AuthApp:
+    """An app with viv-auth initialized, plus helpers to seed users and sign in."""
+
+    def __init__(self, app, User, require_auth, engine, SessionLocal):
+        self.app = app
+        self.User = User
+        self.require_auth = require_auth
+        self.engine = engine
+        self.SessionLocal = SessionLocal
+        self.client = TestClient(app)
+
+    def add_user(self, email: str, **fields) -> int:
+        db = self.SessionLocal()
+        try:
+            user = self.User(email=email, **fields)
+            db.add(user)
+            db.commit()
+            return user.id
+        finally:
+            db.close()
+
+    def authed_client(self, user_id: int, secret: str = TEST_SECRET) -> TestClient:
+        """self.client carrying a session cookie for user_id signed with secret."""
+        self.client.cookies.set(COOKIE_NAME, SessionManager(secret).create_session(user_id))
+        return self.client
 
 
 @pytest.fixture
@@ -29,6 +59,38 @@ def db_setup():
     return engine, Base, get_db, SessionLocal
 
 
+@pytest.fixture
+def make_app(db_setup, monkeypatch):
+    """Factory: make_app(config=None, get_db=None, **init_auth_kwargs) -> AuthApp.
+
+    SESSION_SECRET is TEST_SECRET; config defaults to AuthConfig(allow_signup=True).
+    Call it once per test (models are bound to the fixture's Base).
+    """
+    monkeypatch.setenv("SESSION_SECRET", TEST_SECRET)
+    engine, Base, default_get_db, SessionLocal = db_setup
+
+    def factory(config: AuthConfig | None = None, get_db=None, **init_kwargs) -> AuthApp:
+        app = FastAPI()
+        User, require_auth = init_auth(
+            app, engine, Base, get_db or default_get_db,
+            config=config or AuthConfig(allow_signup=True),
+            **init_kwargs,
+        )
+        return AuthApp(app, User, require_auth, engine, SessionLocal)
+
+    return factory
+
+
+@pytest.fixture
+def sent_emails(monkeypatch):
+    """Magic link URLs passed to send_magic_link, which is stubbed to succeed."""
+    from viv_auth import routes
+
+    sent = []
+    monkeypatch.setattr(routes, "send_magic_link", lambda to, url, *a: sent.append(url) or True)
+    return sent
+
+
 @pytest.fixture
 def app_with_auth(db_setup):
     """Create a FastAPI app with viv-auth initialized."""
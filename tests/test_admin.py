@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from viv_auth import AuthConfig, SharedMemoryCache, init_auth
+from viv_auth.session import SessionManager
+
+from conftest import TEST_SECRET
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN = {"cookie": f"viv_session={SessionManager(TEST_SECRET).create_session(1)}"}
+
+
+def _setup(tmp_path, monkeypatch, users=1, cache=None):
+    monkeypatch.setenv("SESSION_SECRET", TEST_SECRET)
+    engine = create_engine(f"sqlite:///{tmp_path / 'admin.db'}")
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    Base = declarative_base()
+    app = FastAPI()
+    init_auth(
+        app, engine, Base, get_db,
+        config=AuthConfig(allow_signup=True),
+        enable_api_keys=True,
+        cache=cache,
+        is_admin=lambda user: user.email == ADMIN_EMAIL,
+    )
+    with engine.begin() as conn:
+        for i in range(1, users + 1):
+            conn.execute(
+                text("INSERT INTO users (id, email, name, is_active, created_at) VALUES (:i, :e, :n, 1, '2024-01-01')"),
+                {"i": i, "e": ADMIN_EMAIL if i == 1 else f"u{i}@example.com", "n": f"User {i}"},
+            )
+            conn.execute(
+                text(
+                    "INSERT INTO api_keys (id, key_prefix, key_hash, name, user_id, created_at) "
+                    "VALUES (:i, 'gbox_pk_x', :h, 'k', :i, '2024-01-01')"
+                ),
+                {"i": i, "h": f"hash{i}"},
+            )
+    return TestClient(app), engine
+
+
+def test_admin_routes_require_admin_user(tmp_path, monkeypatch):
+    client, _ = _setup(tmp_path, monkeypatch, users=2)
+    # Not signed in: the usual require_auth redirect
+    assert client.get("/auth/admin/users", follow_redirects=False).status_code == 303
+
+    non_admin = {"cookie": f"viv_session={SessionManager(TEST_SECRET).create_session(2)}"}
+    assert client.get("/auth/admin/users", headers=non_admin).status_code == 403
+    assert client.post("/auth/admin/users/deactivate", json={"ids": [1]}, headers=non_admin).status_code == 403
+
+    assert client.get("/auth/admin/users", headers=ADMIN).status_code == 200
+
+
+def test_keyset_pagination_walks_every_user_once(tmp_path, monkeypatch):
+    client, _ = _setup(tmp_path, monkeypatch, users=25)
+    seen, after = [], 0
+    while after is not None:
+        page = client.get("/auth/admin/users", params={"after": after, "limit": 10}, headers=ADMIN).json()
+        seen += [item["id"] for item in page["items"]]
+        after = page["next_after"]
+    assert seen == list(range(1, 26))
+
+
+def test_list_api_keys_filters_by_user(tmp_path, monkeypatch):
+    client, _ = _setup(tmp_path, monkeypatch, users=3)
+    items = client.get("/auth/admin/api-keys", params={"user_id": 2}, headers=ADMIN).json()["items"]
+    assert [item["user_id"] for item in items] == [2]
+    assert "key_hash" not in items[0]
+
+
+def test_bulk_deactivate_and_revoke(tmp_path, monkeypatch):
+    client, engine = _setup(tmp_path, monkeypatch, users=5)
+    resp = client.post("/auth/admin/users/deactivate", json={"ids": [2, 3, 99]}, headers=ADMIN)
+    assert resp.json() == {"updated": 2}
+    resp = client.post("/auth/admin/api-keys/revoke", json={"ids": [1, 4]}, headers=ADMIN)
+    assert resp.json() == {"revoked": 2}
+    # Revoking again is a no-op
+    assert client.post("/auth/admin/api-keys/revoke", json={"ids": [1]}, headers=ADMIN).json() == {"revoked": 0}
+
+    with engine.connect() as conn:
+        inactive = conn.execute(text("SELECT id FROM users WHERE is_active = 0 ORDER BY id")).scalars().all()
+        revoked = conn.execute(text("SELECT id FROM api_keys WHERE revoked_at IS NOT NULL ORDER BY id")).scalars().all()
+    assert inactive == [2, 3]
+    assert revoked == [1, 4]
+
+
+def test_bulk_actions_invalidate_cache(tmp_path, monkeypatch):
+    cache = SharedMemoryCache(tmp_path / "cache.bin", slots=64)
+    client, _ = _setup(tmp_path, monkeypatch, users=2, cache=cache)
+    cache.set("user", 2, {"id": 2, "is_active": True})
+    cache.set("api_key", "hash2", {"user_id": 2})
+
+    client.post("/auth/admin/users/deactivate", json={"ids": [2]}, headers=ADMIN)
+    client.post("/auth/admin/api-keys/revoke", json={"ids": [2]}, headers=ADMIN)
+
+    assert cache.get("user", 2) is None
+    assert cache.get("api_key", "hash2") is None
+    cache.close()
+
+
+def test_export_ndjson_and_csv(tmp_path, monkeypatch):
+    client, _ = _setup(tmp_path, monkeypatch, users=2500)
+
+    resp = client.get("/auth/admin/users/export", headers=ADMIN)
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["id"] for row in rows] == list(range(1, 2501))
+    assert rows[1]["email"] == "u2@example.com"
+
+    resp = client.get("/auth/admin/api-keys/export", params={"format": "csv"}, headers=ADMIN)
+    assert resp.headers["content-type"].startswith("text/csv")
+    reader = list(csv.DictReader(io.StringIO(resp.text)))
+    assert len(reader) == 2500
+    assert reader[-1]["user_id"] == "2500"
+
+    assert client.get("/auth/admin/users/export", params={"format": "xml"}, headers=ADMIN).status_code == 422
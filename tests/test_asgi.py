@@ -0,0 +1,80 @@
+from fastapi import Depends, Request
+
+from viv_auth.asgi import AuthMiddleware
+from viv_auth.session import SessionManager
+
+from conftest import TEST_SECRET
+
+
+def _app(make_app):
+    auth = make_app(protected_paths={"/": True, "/auth/": False, "/public/": False})
+    app, require_auth = auth.app, auth.require_auth
+    calls = []
+
+    @app.get("/dashboard")
+    async def dashboard(user=Depends(require_auth)):
+        calls.append(user.id)
+        return {"email": user.email}
+
+    @app.get("/api/data")
+    async def api_data(request: Request):
+        return {"user_id": request.state.user.id}
+
+    @app.post("/api/upload")
+    async def upload(request: Request):
+        calls.append("body-read")
+        await request.body()
+        return {}
+
+    @app.get("/public/info")
+    async def info():
+        return {"ok": True}
+
+    return auth, auth.add_user("asgi@example.com"), calls
+
+
+def test_rejects_before_routing(make_app):
+    auth, _, calls = _app(make_app)
+    client = auth.client
+
+    response = client.get("/dashboard", follow_redirects=False)
+    assert response.status_code == 303
+    assert response.headers["location"] == "/auth/login"
+
+    response = client.post("/api/upload", content=b"x" * 1000)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Not authenticated"}
+    assert calls == []
+
+
+def test_unprotected_prefixes_pass_through(make_app):
+    client = _app(make_app)[0].client
+    assert client.get("/public/info").json() == {"ok": True}
+    assert client.get("/auth/login").status_code == 200
+
+
+def test_principal_stored_in_scope_state(make_app):
+    auth, user_id, calls = _app(make_app)
+    client = auth.authed_client(user_id)
+
+    assert client.get("/api/data").json() == {"user_id": user_id}
+    assert client.get("/dashboard").json() == {"email": "asgi@example.com"}
+    assert calls == [user_id]
+
+
+def test_longest_prefix_wins():
+    middleware = AuthMiddleware(None, None, {"/": False, "/admin/": True, "/admin/health": False})
+    assert middleware.is_protected("/admin/users") is True
+    assert middleware.is_protected("/admin/health") is False
+    assert middleware.is_protected("/about") is False
+
+
+def test_middleware_reissues_retired_cookie(make_app, monkeypatch):
+    monkeypatch.setenv("SESSION_SECRET_PREVIOUS", "old-secret")
+    auth, user_id, _ = _app(make_app)
+    client = auth.authed_client(user_id, secret="old-secret")
+
+    response = client.get("/api/data")
+    assert response.json() == {"user_id": user_id}
+    reissued = response.cookies["viv_session"]
+    assert SessionManager(TEST_SECRET).check_session(reissued) == (user_id, False)
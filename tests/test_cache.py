@@ -0,0 +1,136 @@
+import multiprocessing
+import time
+from datetime import datetime, timezone
+
+from fastapi import Depends
+from sqlalchemy import event
+
+from viv_auth.cache import SharedMemoryCache, decode_record, encode_record
+
+
+def test_record_codec_roundtrip():
+    record = {
+        "id": 42,
+        "email": "codec@example.com",
+        "name": None,
+        "is_active": True,
+        "score": 1.5,
+        "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456),
+        "seen_at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+    }
+    assert decode_record(encode_record(record)) == record
+
+
+def test_get_set_delete(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=64)
+    assert cache.get("user", 1) is None
+    assert cache.set("user", 1, {"id": 1, "email": "a@example.com"})
+    assert cache.get("user", 1) == {"id": 1, "email": "a@example.com"}
+    assert cache.get("api_key", 1) is None
+
+    cache.delete("user", 1)
+    assert cache.get("user", 1) is None
+
+
+def test_ttl_expiry(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=64)
+    cache.set("user", 1, {"id": 1}, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("user", 1) is None
+
+
+def test_namespace_invalidation(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=64)
+    cache.set("api_key", "abc", {"user_id": 1})
+    cache.set("user", 1, {"id": 1})
+    cache.invalidate("api_key")
+    assert cache.get("api_key", "abc") is None
+    assert cache.get("user", 1) == {"id": 1}
+
+    cache.set("api_key", "abc", {"user_id": 2})
+    assert cache.get("api_key", "abc") == {"user_id": 2}
+
+
+def test_eviction_keeps_table_bounded(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=4, probe=4)
+    for i in range(10):
+        cache.set("user", i, {"id": i}, ttl=100 + i)
+    hits = [i for i in range(10) if cache.get("user", i) is not None]
+    assert hits == [6, 7, 8, 9]
+
+
+def test_oversized_record_rejected(tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=4, slot_size=64)
+    assert cache.set("user", 1, {"email": "x" * 100}) is False
+
+
+def _child_set(path):
+    SharedMemoryCache(path).set("user", 7, {"id": 7, "email": "child@example.com"})
+
+
+def test_shared_across_processes(tmp_path):
+    path = str(tmp_path / "c")
+    cache = SharedMemoryCache(path)
+    process = multiprocessing.get_context("fork").Process(target=_child_set, args=(path,))
+    process.start()
+    process.join()
+    assert cache.get("user", 7) == {"id": 7, "email": "child@example.com"}
+
+
+def test_require_auth_served_from_cache(make_app, tmp_path):
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=64)
+    auth = make_app(cache=cache)
+
+    @auth.app.get("/me")
+    async def me(user=Depends(auth.require_auth)):
+        return {"email": user.email}
+
+    client = auth.authed_client(auth.add_user("cached@example.com"))
+
+    statements = []
+    event.listen(auth.engine, "before_cursor_execute", lambda conn, cursor, stmt, *a: statements.append(stmt))
+
+    assert client.get("/me").json() == {"email": "cached@example.com"}
+    assert len(statements) == 1
+    assert client.get("/me").json() == {"email": "cached@example.com"}
+    assert len(statements) == 1
+
+
+def test_cached_user_changes_can_be_persisted(make_app, tmp_path):
+    import hashlib
+
+    from sqlalchemy import text
+
+    cache = SharedMemoryCache(str(tmp_path / "c"), slots=64)
+    auth = make_app(cache=cache, enable_api_keys=True)
+
+    @auth.app.post("/rename/{name}")
+    async def rename(name: str, user=Depends(auth.require_auth)):
+        db = auth.SessionLocal()
+        try:
+            db.add(user)
+            user.name = name
+            db.commit()
+        finally:
+            db.close()
+        return {}
+
+    user_id = auth.add_user("rename@example.com")
+    raw_key = "gbox_pk_" + "r" * 32
+    with auth.engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO api_keys (key_prefix, key_hash, name, user_id, created_at) VALUES (:p, :h, 'k', :u, '2024-01-01')"),
+            {"p": raw_key[:16], "h": hashlib.sha256(raw_key.encode()).hexdigest(), "u": user_id},
+        )
+    client = auth.authed_client(user_id)
+    bearer = {"Authorization": f"Bearer {raw_key}"}
+
+    # Session cookie: cache miss, then hit
+    assert client.post("/rename/one").status_code == 200
+    assert client.post("/rename/two").status_code == 200
+    # API key: miss (populates the key entry), then hit
+    assert client.post("/rename/three", headers=bearer).status_code == 200
+    assert client.post("/rename/four", headers=bearer).status_code == 200
+
+    with auth.engine.connect() as conn:
+        assert conn.execute(text("SELECT name FROM users")).scalars().all() == ["four"]
@@ -0,0 +1,93 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from viv_auth import AuthConfig, init_auth
+from viv_auth.events import (
+    AUTH_FAILED,
+    LOGIN_REQUESTED,
+    TOKEN_VERIFIED,
+    AuthEventStream,
+    CallbackSink,
+    DBSink,
+    NDJSONFileSink,
+)
+
+
+def test_ring_buffer_drops_oldest():
+    batches = []
+    stream = AuthEventStream([CallbackSink(batches.append)], capacity=3, batch_size=10)
+    for i in range(5):
+        stream.emit(LOGIN_REQUESTED, user_id=i)
+    assert stream.dropped == 2
+
+    stream.flush()
+    assert [e.user_id for e in batches[0]] == [2, 3, 4]
+
+
+def test_flush_drains_in_batches():
+    batches = []
+    stream = AuthEventStream([CallbackSink(batches.append)], batch_size=2)
+    for i in range(5):
+        stream.emit(AUTH_FAILED, reason="x")
+    stream.flush()
+    assert [len(b) for b in batches] == [2, 2, 1]
+
+
+def test_background_thread_drains_on_stop():
+    batches = []
+    stream = AuthEventStream([CallbackSink(batches.append)], flush_interval=0.01)
+    stream.start()
+    stream.emit(TOKEN_VERIFIED, user_id=1)
+    stream.stop()
+    assert sum(len(b) for b in batches) == 1
+
+
+def test_ndjson_sink_rotates(tmp_path):
+    path = tmp_path / "events.ndjson"
+    sink = NDJSONFileSink(str(path), max_bytes=50, backup_count=2)
+    stream = AuthEventStream([sink], batch_size=1)
+    for i in range(4):
+        stream.emit(LOGIN_REQUESTED, user_id=i, email="someone@example.com")
+    stream.flush()
+    sink.close()
+
+    assert (tmp_path / "events.ndjson.1").exists()
+    assert (tmp_path / "events.ndjson.2").exists()
+    assert not (tmp_path / "events.ndjson.3").exists()
+    line = (tmp_path / "events.ndjson.1").read_text().splitlines()[0]
+    assert json.loads(line)["type"] == LOGIN_REQUESTED
+
+
+def test_db_sink_bulk_insert():
+    engine = create_engine("sqlite:///:memory:")
+    stream = AuthEventStream([DBSink(engine)])
+    stream.emit(LOGIN_REQUESTED, user_id=1, email="a@example.com")
+    stream.emit(AUTH_FAILED, reason="invalid_token")
+    stream.flush()
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT type, reason FROM auth_events ORDER BY id")).fetchall()
+    assert rows == [(LOGIN_REQUESTED, None), (AUTH_FAILED, "invalid_token")]
+
+
+def test_routes_emit_events(db_setup):
+    engine, Base, get_db, SessionLocal = db_setup
+    batches = []
+    stream = AuthEventStream([CallbackSink(batches.append)])
+    app = FastAPI()
+    init_auth(
+        app, engine, Base, get_db,
+        config=AuthConfig(allow_signup=True),
+        events=stream,
+    )
+    client = TestClient(app)
+
+    client.post("/auth/login", data={"email": "events@example.com"})
+    client.get("/auth/verify?token=nonexistent")
+    stream.stop()
+
+    types = [e.type for batch in batches for e in batch]
+    assert types == [LOGIN_REQUESTED, AUTH_FAILED]
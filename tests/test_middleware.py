@@ -1,3 +1,6 @@
+import pytest
+
+from viv_auth import AuthConfig
 from viv_auth.middleware import NotAuthenticated
 
 
@@ -50,3 +53,75 @@ def test_api_route_invalid_cookie_returns_401(client):
     response = client.get("/api/data")
     assert response.status_code == 401
     assert response.json() == {"detail": "Not authenticated"}
+
+
+def _lazy_app(make_app, **config):
+    from fastapi import Depends
+    from viv_auth import AuthConfig
+
+    auth = make_app(config=AuthConfig(allow_signup=True, lazy_user=True, **config))
+
+    @auth.app.get("/whoami")
+    async def whoami(user=Depends(auth.require_auth)):
+        return {"user_id": user.id, "type": type(user).__name__}
+
+    @auth.app.get("/email")
+    async def email(user=Depends(auth.require_auth)):
+        return {"email": user.email}
+
+    @auth.app.get("/email-eager")
+    async def email_eager(user=Depends(auth.require_auth.with_fields("email"))):
+        return {"email": user.email}
+
+    user_id = auth.add_user("lazy@example.com")
+    return auth.authed_client(user_id), auth.engine, user_id
+
+
+def _count_user_selects(engine):
+    from sqlalchemy import event
+
+    statements = []
+
+    def before(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before)
+    return statements
+
+
+def test_lazy_user_skips_db_for_id(make_app):
+    client, engine, user_id = _lazy_app(make_app)
+    statements = _count_user_selects(engine)
+
+    response = client.get("/whoami")
+    assert response.json() == {"user_id": user_id, "type": "UserProxy"}
+    assert statements == []
+
+    response = client.get("/email")
+    assert response.json() == {"email": "lazy@example.com"}
+    assert len(statements) == 1
+
+
+def test_lazy_user_eager_fields_single_query(make_app):
+    client, engine, user_id = _lazy_app(make_app)
+    statements = _count_user_selects(engine)
+
+    response = client.get("/email-eager")
+    assert response.json() == {"email": "lazy@example.com"}
+    assert len(statements) == 1
+    assert "is_active" not in statements[0]
+
+    # Routes on the plain dependency stay DB-free
+    response = client.get("/whoami")
+    assert response.json() == {"user_id": user_id, "type": "UserProxy"}
+    assert len(statements) == 1
+
+
+def test_with_fields_variants_are_cached(make_app):
+    auth = make_app(config=AuthConfig(lazy_user=True))
+    require_auth = auth.require_auth
+    assert require_auth.with_fields("email", "name") is require_auth.with_fields("id", "email", "name", "email")
+    assert require_auth.with_fields() is require_auth
+    with pytest.raises(AttributeError):
+        require_auth.with_fields("no_such_column")
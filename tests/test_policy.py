@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+from viv_auth import AuthConfig, DomainPolicy
+from viv_auth.policy import parse_rules
+
+
+def test_blocklist_only_allows_everything_else():
+    policy = DomainPolicy(block=["spam.test", "*.throwaway.test"])
+    assert policy.allows("a@example.com")
+    assert not policy.allows("a@spam.test")
+    assert not policy.allows("a@x.throwaway.test")
+    # A wildcard covers subdomains only
+    assert policy.allows("a@throwaway.test")
+
+
+def test_allowlist_denies_unmatched_domains():
+    policy = DomainPolicy(allow=["corp.com", "*.corp.com"])
+    assert policy.allows("a@corp.com")
+    assert policy.allows("a@eu.mail.corp.com")
+    assert policy.allows("A@CORP.COM.")
+    assert not policy.allows("a@example.com")
+    assert not policy.allows("not-an-email")
+
+
+def test_most_specific_rule_wins():
+    policy = DomainPolicy(
+        allow=["*.corp.com", "ok.contractors.corp.com"],
+        block=["*.contractors.corp.com"],
+    )
+    assert policy.allows("a@hq.corp.com")
+    assert not policy.allows("a@x.contractors.corp.com")
+    assert policy.allows("a@ok.contractors.corp.com")
+
+
+def test_block_wins_tie():
+    policy = DomainPolicy(allow=["corp.com"], block=["corp.com"])
+    assert not policy.allows("a@corp.com")
+
+
+def test_invalid_rules_rejected():
+    with pytest.raises(ValueError):
+        DomainPolicy(allow=["*"])
+    with pytest.raises(ValueError):
+        DomainPolicy(block=["foo.*.com"])
+    with pytest.raises(ValueError):
+        parse_rules("permit example.com")
+
+
+def test_file_rules_reload_on_change(tmp_path):
+    path = tmp_path / "domains.txt"
+    path.write_text("# tenants\nallow corp.com\n")
+    policy = DomainPolicy(block=["spam.test"], path=str(path), reload_interval=0)
+    assert policy.allows("a@corp.com")
+    assert not policy.allows("a@other.com")
+
+    path.write_text("allow other.com\n")
+    os.utime(path, ns=(0, 10**18))
+    assert policy.allows("a@other.com")
+    assert not policy.allows("a@corp.com")
+    assert not policy.allows("a@spam.test")
+
+    # A broken file keeps the previous rules
+    path.write_text("allow\n")
+    os.utime(path, ns=(0, 2 * 10**18))
+    assert policy.allows("a@other.com")
+
+
+def test_login_rejects_disallowed_domain_before_db(make_app, sent_emails):
+    def get_db():
+        raise AssertionError("database used for a blocked domain")
+        yield
+
+    auth = make_app(config=AuthConfig(allow_signup=True, allowed_domains=("corp.com",)), get_db=get_db)
+
+    response = auth.client.post("/auth/login", data={"email": "x@example.com"})
+    assert response.status_code == 403
+    assert sent_emails == []
+    with auth.engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 0
+
+
+def test_policy_rejection_is_traced(make_app):
+    from viv_auth import AuthTracer
+
+    reports = []
+    auth = make_app(
+        config=AuthConfig(allow_signup=True, blocked_domains=("spam.test",)),
+        tracer=AuthTracer(threshold_ms=0, callback=reports.append),
+    )
+    auth.client.post("/auth/login", data={"email": "x@spam.test"})
+    assert [r.name for r in reports] == ["login_submit"]
+    assert [phase for phase, _ in reports[0].phases] == ["domain_policy"]
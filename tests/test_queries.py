@@ -0,0 +1,61 @@
+import hashlib
+
+from fastapi import Depends
+from sqlalchemy import text
+
+from viv_auth import AuthConfig
+from viv_auth.queries import AuthQueries
+
+
+def _app(make_app, **config):
+    auth = make_app(config=AuthConfig(allow_signup=True, **config), enable_api_keys=True)
+
+    @auth.app.get("/me")
+    async def me(user=Depends(auth.require_auth)):
+        return {"email": user.email}
+
+    return auth
+
+
+def test_warm_up_compiles_statements(make_app):
+    auth = _app(make_app, warm_up_connections=2)
+    assert len(auth.engine._compiled_cache) >= 5
+
+
+def test_user_columns_statement_reused(make_app):
+    queries = AuthQueries(_app(make_app).User)
+    assert queries.user_columns(["id", "email"]) is queries.user_columns(("id", "email"))
+
+
+def test_api_key_paths_touch_last_used(make_app):
+    auth = _app(make_app)
+    user_id = auth.add_user("key@example.com")
+    db = auth.SessionLocal()
+    raw_key = "gbox_pk_" + "k" * 32
+    db.execute(
+        text("INSERT INTO api_keys (key_prefix, key_hash, name, user_id, created_at) VALUES (:p, :h, 'k', :u, '2024-01-01')"),
+        {"p": raw_key[:16], "h": hashlib.sha256(raw_key.encode()).hexdigest(), "u": user_id},
+    )
+    db.commit()
+    client = auth.client
+
+    response = client.get("/me", headers={"Authorization": f"Bearer {raw_key}"})
+    assert response.json() == {"email": "key@example.com"}
+    assert db.execute(text("SELECT last_used_at FROM api_keys")).scalar() is not None
+
+    response = client.post("/auth/api-key-login", json={"api_key": raw_key})
+    assert response.status_code == 200
+    assert client.get("/me").json() == {"email": "key@example.com"}
+
+    response = client.post("/auth/api-key-login", json={"api_key": "gbox_pk_wrong"})
+    assert response.status_code == 401
+
+
+
+def test_warm_up_compiles_lazy_column_selects(make_app, db_setup):
+    from sqlalchemy import event
+
+    statements = []
+    event.listen(db_setup[0], "before_cursor_execute", lambda conn, cursor, stmt, *a: statements.append(stmt))
+    _app(make_app, lazy_user=True, warm_up_connections=1)
+    assert any(stmt.startswith("SELECT users.id, users.email, users.name") for stmt in statements)
@@ -0,0 +1,173 @@
+import hashlib
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from viv_auth import AuthConfig, RecentWrites, init_auth
+from viv_auth.session import SessionManager
+
+from conftest import TEST_SECRET
+
+
+def _session_dependency(engine):
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    return get_db
+
+
+def _setup(tmp_path, monkeypatch, config=None, **init_kwargs):
+    """Two SQLite files standing in for a primary and its read replica."""
+    monkeypatch.setenv("SESSION_SECRET", TEST_SECRET)
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base = declarative_base()
+    app = FastAPI()
+    User, require_auth = init_auth(
+        app, primary, Base, _session_dependency(primary),
+        config=config or AuthConfig(allow_signup=True),
+        enable_api_keys=True,
+        get_read_db=_session_dependency(replica),
+        **init_kwargs,
+    )
+    Base.metadata.create_all(bind=replica)
+    app.state.require_auth = require_auth
+
+    @app.get("/me")
+    async def me(user=Depends(require_auth)):
+        return {"id": user.id, "name": user.name}
+
+    return TestClient(app), primary, replica
+
+
+def _insert_user(engine, user_id, email, name):
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO users (id, email, name, is_active, created_at) VALUES (:i, :e, :n, 1, '2024-01-01')"),
+            {"i": user_id, "e": email, "n": name},
+        )
+
+
+def test_lookups_read_from_replica(tmp_path, monkeypatch):
+    client, primary, replica = _setup(tmp_path, monkeypatch)
+    _insert_user(primary, 1, "r@example.com", "primary")
+    _insert_user(replica, 1, "r@example.com", "replica")
+
+    client.cookies.set("viv_session", SessionManager(TEST_SECRET).create_session(1))
+    assert client.get("/me").json() == {"id": 1, "name": "replica"}
+
+
+def test_fresh_signup_falls_back_to_primary(tmp_path, monkeypatch):
+    client, primary, replica = _setup(tmp_path, monkeypatch)
+
+    client.post("/auth/login", data={"email": "new@example.com"})
+    with primary.connect() as conn:
+        user_id, token = conn.execute(
+            text("SELECT users.id, token FROM users JOIN magic_tokens ON magic_tokens.user_id = users.id")
+        ).one()
+    with replica.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 0
+
+    response = client.get(f"/auth/verify?token={token}", follow_redirects=False)
+    assert response.status_code == 303
+    assert client.get("/me").json() == {"id": user_id, "name": None}
+
+
+def _insert_key(engine, raw_key, user_id=1) -> str:
+    key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO api_keys (key_prefix, key_hash, name, user_id, created_at) VALUES (:p, :h, 'k', :u, '2024-01-01')"),
+            {"p": raw_key[:16], "h": key_hash, "u": user_id},
+        )
+    return key_hash
+
+
+def _count_queries(engine) -> list:
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, stmt, *a: statements.append(stmt))
+    return statements
+
+
+def test_new_api_key_found_and_usage_written_to_primary(tmp_path, monkeypatch):
+    client, primary, replica = _setup(tmp_path, monkeypatch)
+    _insert_user(primary, 1, "k@example.com", "primary")
+    _insert_user(replica, 1, "k@example.com", "replica")
+    raw_key = "gbox_pk_" + "x" * 32
+    # The default RecentWrites init_auth created is reachable from require_auth
+    client.app.state.require_auth.recent_writes.note(key_hash=_insert_key(primary, raw_key))
+
+    response = client.get("/me", headers={"Authorization": f"Bearer {raw_key}"})
+    assert response.json() == {"id": 1, "name": "replica"}
+    with primary.connect() as conn:
+        assert conn.execute(text("SELECT last_used_at FROM api_keys")).scalar() is not None
+
+
+def test_warm_up_leaves_read_only_replica_untouched(tmp_path, monkeypatch):
+    from viv_auth.models import create_auth_models
+
+    monkeypatch.setenv("SESSION_SECRET", TEST_SECRET)
+    replica_path = tmp_path / "replica.db"
+    SeedBase = declarative_base()
+    create_auth_models(SeedBase)
+    SeedBase.metadata.create_all(bind=create_engine(f"sqlite:///{replica_path}"))
+
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///file:{replica_path}?mode=ro&uri=true")
+    init_auth(
+        FastAPI(), primary, declarative_base(), _session_dependency(primary),
+        config=AuthConfig(warm_up_connections=2),
+        enable_api_keys=True,
+        get_read_db=_session_dependency(replica),
+    )
+    assert len(replica._compiled_cache) >= 4
+
+
+def test_unknown_lookups_never_reach_primary(tmp_path, monkeypatch):
+    client, primary, replica = _setup(tmp_path, monkeypatch)
+    _insert_key(primary, "gbox_pk_" + "u" * 32)  # not yet replicated, not noted
+    primary_queries = _count_queries(primary)
+
+    for raw_key in ("gbox_pk_bogus", "gbox_pk_" + "u" * 32):
+        response = client.get("/me", headers={"Authorization": f"Bearer {raw_key}"}, follow_redirects=False)
+        assert response.status_code == 303
+    client.cookies.set("viv_session", SessionManager(TEST_SECRET).create_session(999))
+    assert client.get("/me", follow_redirects=False).status_code == 303
+    assert primary_queries == []
+
+
+def test_always_fallback_retries_every_miss(tmp_path, monkeypatch):
+    client, primary, replica = _setup(
+        tmp_path, monkeypatch, config=AuthConfig(replica_fallback="always"),
+    )
+    _insert_user(primary, 1, "a@example.com", "primary")
+    raw_key = "gbox_pk_" + "a" * 32
+    _insert_key(primary, raw_key)
+
+    response = client.get("/me", headers={"Authorization": f"Bearer {raw_key}"})
+    assert response.json() == {"id": 1, "name": "primary"}
+
+
+def test_explicit_recent_writes_is_exposed(tmp_path, monkeypatch):
+    recent_writes = RecentWrites(10)
+    client, _, _ = _setup(tmp_path, monkeypatch, recent_writes=recent_writes)
+    assert client.app.state.require_auth.recent_writes is recent_writes
+
+
+def test_recent_writes_window():
+    recent = RecentWrites(60)
+    recent.note(user_id=1, email="a@example.com")
+    assert recent.seen({"user_id": 1})
+    assert recent.seen({"email": "a@example.com"})
+    assert not recent.seen({"user_id": 2})
+    expired = RecentWrites(-1)
+    expired.note(user_id=1)
+    assert not expired.seen({"user_id": 1})
@@ -129,3 +129,65 @@ def test_logout_clears_cookie(client, db_session, app_with_auth):
     response = client.get("/auth/logout", follow_redirects=False)
     assert response.status_code == 303
     assert response.headers["location"] == "/auth/login"
+
+
+def _coalescing_client(make_app, **config):
+    from viv_auth import AuthConfig
+
+    auth = make_app(config=AuthConfig(allow_signup=True, login_coalesce_window=60, **config))
+    return auth.client, auth.SessionLocal()
+
+
+def _token_rows(db):
+    from sqlalchemy import text
+    return db.execute(text("SELECT token, used FROM magic_tokens")).fetchall()
+
+
+def test_login_coalesces_repeated_submits(make_app, sent_emails):
+    client, db = _coalescing_client(make_app)
+
+    for _ in range(3):
+        response = client.post("/auth/login", data={"email": "retry@example.com"})
+        assert "Check your email" in response.text
+
+    assert len(_token_rows(db)) == 1
+    assert len(sent_emails) == 1
+
+
+def test_login_coalesce_resend_reuses_token(make_app, sent_emails):
+    client, db = _coalescing_client(make_app, login_coalesce_resend=True)
+
+    client.post("/auth/login", data={"email": "resend@example.com"})
+    client.post("/auth/login", data={"email": "resend@example.com"})
+
+    assert len(_token_rows(db)) == 1
+    assert len(sent_emails) == 2
+    assert sent_emails[0] == sent_emails[1]
+
+
+def test_login_issues_new_token_after_use(make_app, sent_emails):
+    client, db = _coalescing_client(make_app)
+
+    client.post("/auth/login", data={"email": "used@example.com"})
+    token_value = _token_rows(db)[0][0]
+    client.get(f"/auth/verify?token={token_value}", follow_redirects=False)
+    client.post("/auth/login", data={"email": "used@example.com"})
+
+    assert len(_token_rows(db)) == 2
+    assert len(sent_emails) == 2
+
+
+def test_login_not_coalesced_after_failed_send(make_app, monkeypatch):
+    from viv_auth import routes
+
+    attempts = []
+    monkeypatch.setattr(routes, "send_magic_link", lambda to, url, *a: attempts.append(url) or len(attempts) > 1)
+    client, db = _coalescing_client(make_app)
+
+    client.post("/auth/login", data={"email": "flaky@example.com"})
+    client.post("/auth/login", data={"email": "flaky@example.com"})
+    client.post("/auth/login", data={"email": "flaky@example.com"})
+
+    # Second submit sends again; third is coalesced onto the delivered token
+    assert len(attempts) == 2
+    assert len(_token_rows(db)) == 2
@@ -0,0 +1,119 @@
+import time
+
+from fastapi import Depends
+from itsdangerous import URLSafeTimedSerializer
+
+from viv_auth.session import SessionKey, SessionManager
+
+from conftest import TEST_SECRET
+
+
+def test_roundtrip_embeds_key_id():
+    manager = SessionManager(keys=[SessionKey("k1", "secret-1")])
+    token = manager.create_session(5)
+    assert token.startswith("k1.")
+    assert manager.check_session(token) == (5, False)
+
+
+def test_invalid_tokens_rejected():
+    manager = SessionManager("secret")
+    assert manager.verify_session("garbage") is None
+    assert manager.verify_session(manager.create_session(5)[:-3] + "abc") is None
+    assert SessionManager("other").verify_session(manager.create_session(5)) is None
+
+
+def test_retired_key_accepted_and_flagged_for_reissue():
+    old = SessionManager.from_secrets("old-secret")
+    token = old.create_session(5)
+
+    rotated = SessionManager.from_secrets("new-secret", ["old-secret"])
+    assert rotated.check_session(token) == (5, True)
+    assert rotated.check_session(rotated.create_session(5)) == (5, False)
+
+
+def test_legacy_cookie_without_key_id_accepted():
+    legacy = URLSafeTimedSerializer("secret").dumps({"user_id": 9})
+    assert SessionManager("secret").check_session(legacy) == (9, True)
+    assert SessionManager("secret", legacy_cutoff=time.time() - 1).check_session(legacy) == (None, False)
+
+
+def test_junk_tokens_skip_legacy_verification(monkeypatch):
+    manager = SessionManager.from_secrets("current", ["old-1", "old-2"])
+    calls = []
+    monkeypatch.setattr(manager, "_loads", lambda serializer, token: calls.append(token))
+
+    for junk in ("garbage-token", "a.b", "a.b.c.d", "unknownkid.x.y.z"):
+        assert manager.check_session(junk) == (None, False)
+    assert calls == []
+
+    manager.check_session("payload.ts.sig")
+    assert len(calls) == 3
+
+
+def test_key_expiry_rejects_its_cookies():
+    manager = SessionManager(keys=[
+        SessionKey("new", "s2"),
+        SessionKey("old", "s1", expires_at=time.time() - 1),
+    ])
+    token = "old." + URLSafeTimedSerializer("s1").dumps({"user_id": 1})
+    assert manager.verify_session(token) is None
+
+
+def test_scheduled_rotation():
+    now = time.time()
+    manager = SessionManager(keys=[
+        SessionKey("a", "s1"),
+        SessionKey("b", "s2", active_from=now + 3600),
+    ])
+    assert manager.signing_kid() == "a"
+    manager.keys["b"].active_from = now - 1
+    manager._next_switch = now
+    assert manager.signing_kid() == "b"
+
+
+def test_require_auth_reissues_retired_cookie(make_app, monkeypatch):
+    monkeypatch.setenv("SESSION_SECRET_PREVIOUS", "old-secret")
+    auth = make_app()
+
+    @auth.app.get("/me")
+    async def me(user=Depends(auth.require_auth)):
+        return {"user_id": user.id}
+
+    user_id = auth.add_user("rotate@example.com")
+    client = auth.authed_client(user_id, secret="old-secret")
+    response = client.get("/me")
+    assert response.json() == {"user_id": user_id}
+    reissued = response.cookies["viv_session"]
+    assert SessionManager(TEST_SECRET).check_session(reissued) == (user_id, False)
+
+    response = client.get("/me")
+    assert "viv_session" not in response.cookies
+
+
+def test_compact_codec_roundtrip_and_size():
+    manager = SessionManager("secret", codec="compact")
+    token = manager.create_session(2**40)
+    assert "." not in token.partition(".")[2]
+    assert len(token) < len(SessionManager("secret").create_session(2**40))
+    assert manager.check_session(token) == (2**40, False)
+
+
+def test_compact_codec_rejects_tampering_and_age():
+    manager = SessionManager("secret", codec="compact")
+    kid, _, payload = manager.create_session(5).partition(".")
+    flipped = payload[:5] + ("A" if payload[5] != "A" else "B") + payload[6:]
+    assert manager.verify_session(f"{kid}.{flipped}") is None
+    assert manager.verify_session(f"{kid}.{payload[:-4]}") is None
+    assert SessionManager("other", codec="compact").verify_session(f"{kid}.{payload}") is None
+
+    expired = SessionManager("secret", max_age=-1, codec="compact")
+    assert expired.verify_session(f"{kid}.{payload}") is None
+
+
+def test_codec_migration_accepts_and_reissues_both_formats():
+    old_cookie = SessionManager("secret").create_session(5)
+    compact = SessionManager("secret", codec="compact")
+    assert compact.check_session(old_cookie) == (5, True)
+
+    compact_cookie = compact.create_session(5)
+    assert SessionManager("secret").check_session(compact_cookie) == (5, True)
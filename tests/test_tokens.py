@@ -0,0 +1,82 @@
+import re
+
+from sqlalchemy import create_engine, text
+
+from viv_auth import AuthConfig
+from viv_auth.tokens import DBNonceStore, MemoryNonceStore, SignedMagicLinks
+
+
+def test_signed_link_roundtrip():
+    links = SignedMagicLinks("secret", nonce_store=MemoryNonceStore())
+    user_id, nonce = links.peek(links.create(7))
+    assert user_id == 7
+    assert links.redeem(nonce) is True
+    assert links.redeem(nonce) is False
+
+
+def test_signed_link_rejects_tampering_and_other_keys():
+    token = SignedMagicLinks("secret", nonce_store=MemoryNonceStore()).create(7)
+    assert SignedMagicLinks("other", nonce_store=MemoryNonceStore()).peek(token) is None
+    assert SignedMagicLinks("secret", nonce_store=MemoryNonceStore()).peek(token[:-2] + "xx") is None
+
+
+def test_signed_link_expiry():
+    links = SignedMagicLinks("secret", max_age=-1, nonce_store=MemoryNonceStore())
+    assert links.peek(links.create(7)) is None
+
+
+def test_memory_nonce_store_expires():
+    store = MemoryNonceStore()
+    assert store.consume("n1", ttl=-1) is True
+    assert store.is_consumed("n1") is False
+    assert store.consume("n1", ttl=60) is True
+    assert store.is_consumed("n1") is True
+    assert store.consume("n1", ttl=60) is False
+
+
+def test_db_nonce_store_single_use():
+    store = DBNonceStore(create_engine("sqlite:///:memory:"), purge_every=2)
+    assert store.consume("n1", ttl=60) is True
+    assert store.consume("n1", ttl=60) is False
+    assert store.is_consumed("n1") is True
+    assert store.is_consumed("n2") is False
+
+
+def test_signed_mode_login_and_verify(make_app, sent_emails):
+    auth = make_app(config=AuthConfig(allow_signup=True, magic_link_mode="signed"))
+    client = auth.client
+    db = auth.SessionLocal()
+    auth.add_user("signed@example.com")
+
+    client.post("/auth/login", data={"email": "signed@example.com"})
+    assert db.execute(text("SELECT COUNT(*) FROM magic_tokens")).scalar() == 0
+
+    token = re.search(r"token=(.+)$", sent_emails[0]).group(1)
+    response = client.get(f"/auth/verify?token={token}", follow_redirects=False)
+    assert response.status_code == 303
+    assert "viv_session" in response.cookies
+
+    response = client.get(f"/auth/verify?token={token}", follow_redirects=False)
+    assert response.status_code == 400
+
+
+def test_signed_mode_single_use_across_workers(make_app, db_setup, sent_emails):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import declarative_base
+
+    from viv_auth import init_auth
+
+    signed = AuthConfig(allow_signup=True, magic_link_mode="signed")
+    worker_a = make_app(config=signed)
+    # A second worker: its own app and models, same database
+    engine, _, get_db, _ = db_setup
+    app_b = FastAPI()
+    init_auth(app_b, engine, declarative_base(), get_db, config=signed)
+    worker_b = TestClient(app_b)
+
+    worker_a.client.post("/auth/login", data={"email": "workers@example.com"})
+    token = re.search(r"token=(.+)$", sent_emails[0]).group(1)
+
+    assert worker_a.client.get(f"/auth/verify?token={token}", follow_redirects=False).status_code == 303
+    assert worker_b.get(f"/auth/verify?token={token}", follow_redirects=False).status_code == 400
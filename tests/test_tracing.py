@@ -0,0 +1,62 @@
+from fastapi import Depends
+
+from viv_auth.tracing import NULL_TRACER, AuthTracer
+
+
+def _app(make_app, tracer):
+    auth = make_app(tracer=tracer)
+
+    @auth.app.get("/protected")
+    async def protected(user=Depends(auth.require_auth)):
+        return {"user_id": user.id}
+
+    return auth.client
+
+
+def test_slow_operations_reported_with_phases(make_app):
+    reports = []
+    client = _app(make_app, AuthTracer(threshold_ms=0, callback=reports.append))
+
+    client.post("/auth/login", data={"email": "trace@example.com"})
+    client.get("/protected", follow_redirects=False)
+
+    assert [r.name for r in reports] == ["login_submit", "require_auth"]
+    login = reports[0]
+    assert login.slow is True
+    assert [phase for phase, _ in login.phases] == [
+        "checkout", "query_user", "signup", "insert_token", "send_email",
+    ]
+    assert sum(ms for _, ms in login.phases) <= login.total_ms
+    assert [phase for phase, _ in reports[1].phases] == ["env", "cookie"]
+
+
+def test_fast_operations_not_reported(make_app):
+    reports = []
+    client = _app(make_app, AuthTracer(threshold_ms=60_000, callback=reports.append))
+    client.get("/protected", follow_redirects=False)
+    assert reports == []
+
+
+def test_sampled_operations_reported(make_app):
+    sampled = []
+    client = _app(make_app, AuthTracer(threshold_ms=60_000, sample_rate=1.0, callback=sampled.append))
+    client.get("/protected", follow_redirects=False)
+    assert len(sampled) == 1
+    assert sampled[0].slow is False
+
+
+def test_api_key_login_early_return_finishes_trace(make_app):
+    reports = []
+    auth = make_app(enable_api_keys=True, tracer=AuthTracer(threshold_ms=0, callback=reports.append))
+
+    assert auth.client.post("/auth/api-key-login", json={}).status_code == 400
+    assert [r.name for r in reports] == ["api_key_login"]
+    assert [phase for phase, _ in reports[0].phases] == ["parse_body"]
+
+
+def test_null_tracer_is_shared_noop():
+    trace = NULL_TRACER.start("require_auth")
+    assert trace is NULL_TRACER.start("verify_token")
+    trace.mark("x")
+    trace.checkout(None)
+    trace.finish()
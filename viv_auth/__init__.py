@@ -2,19 +2,48 @@ import logging
 import os
 import secrets
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse, RedirectResponse
 from sqlalchemy import Engine
 
+from .admin import create_admin_router
+from .asgi import AuthMiddleware
+from .cache import SharedMemoryCache
 from .config import AuthConfig
-from .middleware import NotAuthenticated, create_require_auth
+from .events import AuthEventStream, CallbackSink, DBSink, NDJSONFileSink
+from .middleware import NotAuthenticated, UserProxy, create_authenticator, create_require_auth
 from .models import create_auth_models
+from .policy import DomainPolicy
+from .queries import AuthQueries
+from .recent import RecentWrites
 from .routes import create_auth_router
-from .session import SessionManager
+from .session import SessionKey, SessionManager
+from .tokens import DBNonceStore, MemoryNonceStore, SignedMagicLinks
+from .tracing import AuthTracer, TraceReport
 
 logger = logging.getLogger("viv_auth")
 
-__all__ = ["init_auth", "AuthConfig", "NotAuthenticated"]
+__all__ = [
+    "init_auth",
+    "AuthConfig",
+    "NotAuthenticated",
+    "UserProxy",
+    "AuthMiddleware",
+    "SharedMemoryCache",
+    "AuthTracer",
+    "TraceReport",
+    "SignedMagicLinks",
+    "DomainPolicy",
+    "RecentWrites",
+    "MemoryNonceStore",
+    "DBNonceStore",
+    "SessionManager",
+    "SessionKey",
+    "AuthEventStream",
+    "NDJSONFileSink",
+    "DBSink",
+    "CallbackSink",
+]
 
 
 def init_auth(
@@ -26,6 +55,15 @@ def init_auth(
     app_url: str | None = None,
     config: AuthConfig | None = None,
     enable_api_keys: bool = False,
+    events: AuthEventStream | None = None,
+    protected_paths: dict[str, bool] | None = None,
+    cache: SharedMemoryCache | None = None,
+    tracer: AuthTracer | None = None,
+    nonce_store=None,
+    session_keys: list[SessionKey] | None = None,
+    get_read_db=None,
+    is_admin=None,
+    recent_writes: RecentWrites | None = None,
 ):
     """Initialize viv-auth on a FastAPI app.
 
@@ -33,18 +71,94 @@ def init_auth(
 
     When enable_api_keys=True, the api_keys table is created and the auth
     chain gains a per-user API key step (Bearer gbox_pk_xxx).
+
+    When an AuthEventStream is passed, login/verify/API-key/failure events are
+    buffered in memory and drained to its sinks by a background thread.
+
+    When protected_paths is given ({prefix: protected}), AuthMiddleware is
+    installed and authenticates matching requests before routing; require_auth
+    then just returns the principal it stored in request.state.user.
+
+    A SharedMemoryCache serves user and API-key lookups across all workers on
+    the host; call cache.delete("user", id) or cache.invalidate("api_key")
+    after changing users or revoking keys outside viv-auth.
+
+    An AuthTracer reports per-phase timings of require_auth, login, verify and
+    API key login when they exceed its threshold (or are sampled).
+
+    With config.magic_link_mode="signed", magic links are signed stateless
+    tokens. Single use is enforced by nonce_store, which defaults to a
+    DBNonceStore on `engine` so it holds across all workers.
+
+    Session cookies carry a key id. SESSION_SECRET_PREVIOUS (comma-separated)
+    lists retired secrets whose cookies are still accepted and transparently
+    re-issued; session_keys replaces both env vars with an explicit
+    (optionally scheduled) key list.
+
+    get_read_db is an optional read-replica session dependency (same shape
+    as get_db). User and API key lookups go to it. With the default
+    config.replica_fallback="recent", a miss is retried on the primary only
+    for rows written in the last config.replica_lag_seconds, as recorded in
+    recent_writes (default: a RecentWrites on `cache` if given, else per
+    process). viv-auth notes its own signups; apps must note the keys they
+    create via require_auth.recent_writes.note(key_hash=...), which is always
+    set (a no-op without a replica). "always" retries every miss.
+
+    With config.warm_up_connections > 0, that many pool connections are
+    opened and every auth statement is executed once before returning.
+
+    config.allowed_domains / blocked_domains / domain_policy_file are
+    compiled into a DomainPolicy that login checks before touching the
+    database; the file is re-read when it changes.
+
+    When is_admin (a callable taking the authenticated user, returning bool)
+    is given, the admin router (user/API key listing, bulk deactivate/revoke,
+    streaming export) is mounted under /auth/admin. Every route requires
+    require_auth and answers 403 unless is_admin(user) is true.
     """
     config = config or AuthConfig()
 
     # Create models
     User, MagicToken, ApiKey = create_auth_models(Base)
+    queries = AuthQueries(User, MagicToken, ApiKey if enable_api_keys else None)
 
     # Session manager
-    secret = os.environ.get("SESSION_SECRET")
-    if not secret:
-        secret = secrets.token_hex(32)
-        logger.warning("[viv-auth] SESSION_SECRET not set — using random key (sessions won't survive restart)")
-    session_manager = SessionManager(secret, max_age=config.session_max_age)
+    if session_keys:
+        session_manager = SessionManager(
+            max_age=config.session_max_age,
+            keys=session_keys,
+            codec=config.session_codec,
+            legacy_cutoff=config.legacy_session_cutoff,
+        )
+        secret = session_manager.keys[session_manager.signing_kid()].secret
+    else:
+        secret = os.environ.get("SESSION_SECRET")
+        if not secret:
+            secret = secrets.token_hex(32)
+            logger.warning("[viv-auth] SESSION_SECRET not set — using random key (sessions won't survive restart)")
+        previous = [s for s in os.environ.get("SESSION_SECRET_PREVIOUS", "").split(",") if s]
+        session_manager = SessionManager.from_secrets(
+            secret,
+            previous,
+            max_age=config.session_max_age,
+            codec=config.session_codec,
+            legacy_cutoff=config.legacy_session_cutoff,
+        )
+
+    if config.replica_fallback not in ("recent", "always"):
+        raise ValueError(f"Unknown replica_fallback {config.replica_fallback!r} (expected 'recent' or 'always')")
+    if recent_writes is None:
+        recent_writes = RecentWrites(config.replica_lag_seconds, cache=cache)
+    # Only consulted (and fed) when replica misses are retried selectively
+    fallback_writes = recent_writes if get_read_db is not None and config.replica_fallback == "recent" else None
+
+    signed_links = None
+    if config.magic_link_mode == "signed":
+        if nonce_store is None:
+            nonce_store = DBNonceStore(engine)
+        signed_links = SignedMagicLinks(secret, config.token_expiry_minutes * 60, nonce_store=nonce_store)
+    elif config.magic_link_mode != "db":
+        raise ValueError(f"Unknown magic_link_mode {config.magic_link_mode!r} (expected 'db' or 'signed')")
 
     # Auth router
     router = create_auth_router(
@@ -56,14 +170,57 @@ def init_auth(
         app_url=app_url,
         config=config,
         ApiKey=ApiKey if enable_api_keys else None,
+        events=events,
+        tracer=tracer,
+        cache=cache,
+        signed_links=signed_links,
+        get_read_db=get_read_db,
+        queries=queries,
+        domain_policy=DomainPolicy.from_config(config),
+        recent_writes=fallback_writes,
     )
     app.include_router(router)
 
     # require_auth dependency
-    require_auth = create_require_auth(
+    authenticate = create_authenticator(
         get_db, User, session_manager,
         ApiKey=ApiKey if enable_api_keys else None,
+        events=events,
+        config=config,
+        cache=cache,
+        tracer=tracer,
+        get_read_db=get_read_db,
+        queries=queries,
+        recent_writes=fallback_writes,
     )
+    require_auth = create_require_auth(get_db, User, session_manager, authenticate=authenticate)
+    require_auth.recent_writes = recent_writes
+
+    # Optional admin router, only for signed-in users the caller deems admins
+    if is_admin is not None:
+
+        async def require_admin(user=Depends(require_auth)):
+            if not is_admin(user):
+                raise HTTPException(status_code=403, detail="Admin only")
+
+        admin_router = create_admin_router(
+            get_db,
+            User,
+            ApiKey=ApiKey if enable_api_keys else None,
+            cache=cache,
+            get_read_db=get_read_db,
+            dependencies=[Depends(require_admin)],
+        )
+        app.include_router(admin_router)
+
+    # Optional scope-level auth before routing
+    if protected_paths is not None:
+        app.add_middleware(
+            AuthMiddleware,
+            authenticate=authenticate,
+            session_manager=session_manager,
+            path_rules=protected_paths,
+        )
 
     # Exception handler for NotAuthenticated
     @app.exception_handler(NotAuthenticated)
@@ -75,6 +232,14 @@ def init_auth(
     # Create tables
     Base.metadata.create_all(bind=engine)
 
+    # Pre-open pool connections and compile the hot statements
+    if config.warm_up_connections:
+        read_dbs = [get_read_db] if get_read_db is not None else []
+        queries.warm_up([get_db, *read_dbs], connections=config.warm_up_connections)
+
+    if events is not None:
+        events.start()
+
     api_keys_status = "api-keys=on" if enable_api_keys else "api-keys=off"
     logger.info(f"[viv-auth] Initialized for '{app_name}' — signup={'on' if config.allow_signup else 'off'}, {api_keys_status}")
 
@@ -0,0 +1,91 @@
+from starlette.requests import HTTPConnection
+from starlette.responses import Response
+
+from .middleware import NotAuthenticated
+from .session import set_session_cookie
+
+DEFAULT_PATH_RULES = {"/": True, "/auth/": False}
+
+_UNAUTHORIZED_BODY = b'{"detail":"Not authenticated"}'
+
+
+class AuthMiddleware:
+    """Pure ASGI middleware that authenticates once per request, before routing.
+
+    `path_rules` maps path prefixes to True (protected) or False (public); the
+    longest matching prefix wins and unmatched paths are public. Authenticated
+    requests carry the principal in scope["state"]["user"] (request.state.user),
+    which require_auth picks up without re-checking. Rejections are answered
+    directly: 401 JSON under `api_prefix`, otherwise a 303 to `login_url`.
+
+    When the session cookie was signed with a retired key, the re-issued
+    cookie is appended to whatever response the app sends.
+    """
+
+    def __init__(
+        self,
+        app,
+        authenticate,
+        path_rules: dict[str, bool] | None = None,
+        api_prefix: str = "/api/",
+        login_url: str = "/auth/login",
+        session_manager=None,
+    ):
+        self.app = app
+        self.authenticate = authenticate
+        self.session_manager = session_manager
+        rules = DEFAULT_PATH_RULES if path_rules is None else path_rules
+        self.path_rules = sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+        self.api_prefix = api_prefix
+        self._unauthorized_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(_UNAUTHORIZED_BODY)).encode()),
+        ]
+        self._redirect_headers = [
+            (b"location", login_url.encode()),
+            (b"content-length", b"0"),
+        ]
+
+    def is_protected(self, path: str) -> bool:
+        for prefix, protected in self.path_rules:
+            if path.startswith(prefix):
+                return protected
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.is_protected(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        conn = HTTPConnection(scope)
+        try:
+            user = self.authenticate(conn)
+        except NotAuthenticated:
+            await self._reject(scope["path"], send)
+            return
+
+        conn.state.user = user
+        reissued = getattr(conn.state, "session_reissue", None)
+        if reissued is not None and self.session_manager is not None:
+            send = self._with_cookie(send, reissued)
+        await self.app(scope, receive, send)
+
+    def _with_cookie(self, send, session_token: str):
+        carrier = Response()
+        set_session_cookie(carrier, self.session_manager, session_token)
+        cookie_headers = [(k, v) for k, v in carrier.raw_headers if k == b"set-cookie"]
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *cookie_headers]
+            await send(message)
+
+        return send_with_cookie
+
+    async def _reject(self, path: str, send):
+        if path.startswith(self.api_prefix):
+            await send({"type": "http.response.start", "status": 401, "headers": self._unauthorized_headers})
+            await send({"type": "http.response.body", "body": _UNAUTHORIZED_BODY})
+        else:
+            await send({"type": "http.response.start", "status": 303, "headers": self._redirect_headers})
+            await send({"type": "http.response.body", "body": b""})
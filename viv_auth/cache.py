@@ -0,0 +1,258 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+# File layout: header, then `slots` fixed-size slots.
+#   header: magic, layout version, slot count, slot size, NAMESPACES x u32 namespace versions
+#   slot:   seq (u32, odd while being written), key hash (u64, 0 = empty),
+#           namespace version (u32), expires_at (f64), value length (u16), value bytes
+_MAGIC = b"VIVC"
+_LAYOUT_VERSION = 1
+NAMESPACES = 16
+_HEADER = struct.Struct(f"<4sIII{NAMESPACES}I")
+_SLOT = struct.Struct("<IQIdH")
+_SEQ = struct.Struct("<I")
+_U32 = struct.Struct("<I")
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def _encode_value(value) -> bytes:
+    if value is None:
+        return b"N"
+    if value is True:
+        return b"T"
+    if value is False:
+        return b"F"
+    if isinstance(value, int):
+        return b"i" + struct.pack("<q", value)
+    if isinstance(value, float):
+        return b"f" + struct.pack("<d", value)
+    if isinstance(value, str):
+        raw = value.encode()
+        return b"s" + struct.pack("<H", len(raw)) + raw
+    if isinstance(value, datetime):
+        aware = value.tzinfo is not None
+        naive = value.astimezone(timezone.utc).replace(tzinfo=None) if aware else value
+        micros = (naive - _EPOCH) // _ONE_MICROSECOND
+        return (b"D" if aware else b"d") + struct.pack("<q", micros)
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def encode_record(record: dict) -> bytes:
+    """Encode a flat dict of column values into a compact tagged binary form."""
+    parts = [struct.pack("<B", len(record))]
+    for key, value in record.items():
+        raw_key = key.encode()
+        parts.append(struct.pack("<B", len(raw_key)) + raw_key + _encode_value(value))
+    return b"".join(parts)
+
+
+def decode_record(data: bytes) -> dict:
+    record = {}
+    count = data[0]
+    pos = 1
+    for _ in range(count):
+        key_len = data[pos]
+        key = data[pos + 1 : pos + 1 + key_len].decode()
+        pos += 1 + key_len
+        tag = data[pos : pos + 1]
+        pos += 1
+        if tag == b"N":
+            value = None
+        elif tag == b"T":
+            value = True
+        elif tag == b"F":
+            value = False
+        elif tag == b"i":
+            (value,) = struct.unpack_from("<q", data, pos)
+            pos += 8
+        elif tag == b"f":
+            (value,) = struct.unpack_from("<d", data, pos)
+            pos += 8
+        elif tag == b"s":
+            (length,) = struct.unpack_from("<H", data, pos)
+            value = data[pos + 2 : pos + 2 + length].decode()
+            pos += 2 + length
+        elif tag in (b"d", b"D"):
+            (micros,) = struct.unpack_from("<q", data, pos)
+            value = _EPOCH + micros * _ONE_MICROSECOND
+            if tag == b"D":
+                value = value.replace(tzinfo=timezone.utc)
+            pos += 8
+        else:
+            raise ValueError(f"Corrupt cache record (tag {tag!r})")
+        record[key] = value
+    return record
+
+
+class SharedMemoryCache:
+    """Fixed-size hash table in a memory-mapped file, shared by every worker on a host.
+
+    Keys live in namespaces ("user", "api_key", ...). Each entry has a TTL and
+    records its namespace's version at write time; invalidate(namespace) bumps
+    the version so every older entry becomes a miss at once. Readers never
+    lock: each slot carries a sequence counter (odd while a write is in
+    progress) and a read is retried if it changes underneath. Writers serialize
+    on a lockf of the file plus a thread lock. Lookups probe `probe` slots;
+    when all are live, the entry closest to expiry is evicted.
+
+    Point `path` at tmpfs (e.g. /dev/shm) so the table never touches disk.
+    POSIX only.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        slots: int = 65536,
+        slot_size: int = 256,
+        ttl: float = 60.0,
+        probe: int = 8,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.probe = min(probe, slots)
+        self._write_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = _HEADER.size + slots * slot_size
+
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            existing = os.fstat(self._fd).st_size
+            if existing == 0:
+                os.ftruncate(self._fd, size)
+                self._mm = mmap.mmap(self._fd, size)
+                _HEADER.pack_into(self._mm, 0, _MAGIC, _LAYOUT_VERSION, slots, slot_size, *([0] * NAMESPACES))
+            else:
+                self._mm = mmap.mmap(self._fd, existing)
+                magic, layout, slots, slot_size, *_ = _HEADER.unpack_from(self._mm, 0)
+                if magic != _MAGIC or layout != _LAYOUT_VERSION:
+                    raise ValueError(f"{path} is not a viv-auth cache file")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_value_size = slot_size - _SLOT.size
+
+    # -- helpers ---------------------------------------------------------
+
+    @staticmethod
+    def _key_hash(namespace: str, key) -> int:
+        digest = hashlib.blake2b(f"{namespace}\0{key}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    @staticmethod
+    def _ns_index(namespace: str) -> int:
+        return zlib.crc32(namespace.encode()) % NAMESPACES
+
+    def _ns_offset(self, namespace: str) -> int:
+        return 16 + 4 * self._ns_index(namespace)
+
+    def _slot_offsets(self, key_hash: int):
+        base = key_hash % self.slots
+        for i in range(self.probe):
+            yield _HEADER.size + ((base + i) % self.slots) * self.slot_size
+
+    def _read_slot(self, offset: int):
+        """Consistent snapshot of a slot, or None if a writer kept it busy."""
+        mm = self._mm
+        for _ in range(4):
+            (seq,) = _SEQ.unpack_from(mm, offset)
+            if seq & 1:
+                continue
+            _, key_hash, version, expires_at, length = _SLOT.unpack_from(mm, offset)
+            start = offset + _SLOT.size
+            value = mm[start : start + length]
+            if _SEQ.unpack_from(mm, offset)[0] == seq:
+                return key_hash, version, expires_at, value
+        return None
+
+    def _write_slot(self, offset: int, key_hash: int, version: int, expires_at: float, value: bytes):
+        mm = self._mm
+        (seq,) = _SEQ.unpack_from(mm, offset)
+        busy = (seq + 1) & 0xFFFFFFFF
+        _SEQ.pack_into(mm, offset, busy)
+        _SLOT.pack_into(mm, offset, busy, key_hash, version, expires_at, len(value))
+        start = offset + _SLOT.size
+        mm[start : start + len(value)] = value
+        _SEQ.pack_into(mm, offset, (seq + 2) & 0xFFFFFFFF)
+
+    @contextmanager
+    def _locked(self):
+        # lockf locks are per process, so workers forked after the cache was
+        # opened still exclude each other; the thread lock covers threads.
+        with self._write_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    # -- public API ------------------------------------------------------
+
+    def get(self, namespace: str, key) -> dict | None:
+        key_hash = self._key_hash(namespace, key)
+        (current,) = _U32.unpack_from(self._mm, self._ns_offset(namespace))
+        now = time.time()
+        for offset in self._slot_offsets(key_hash):
+            slot = self._read_slot(offset)
+            if slot is None or slot[0] != key_hash:
+                continue
+            _, version, expires_at, value = slot
+            if version != current or expires_at <= now:
+                return None
+            return decode_record(value)
+        return None
+
+    def set(self, namespace: str, key, record: dict, ttl: float | None = None) -> bool:
+        """Store a record; returns False if it doesn't fit in a slot."""
+        value = encode_record(record)
+        if len(value) > self.max_value_size:
+            return False
+        key_hash = self._key_hash(namespace, key)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+
+        with self._locked():
+            (current,) = _U32.unpack_from(self._mm, self._ns_offset(namespace))
+            now = time.time()
+            target = victim = None
+            victim_expiry = float("inf")
+            for offset in self._slot_offsets(key_hash):
+                _, slot_hash, version, slot_expiry, _ = _SLOT.unpack_from(self._mm, offset)
+                if slot_hash == key_hash:
+                    target = offset
+                    break
+                if target is None and (slot_hash == 0 or slot_expiry <= now):
+                    target = offset
+                if slot_expiry < victim_expiry:
+                    victim, victim_expiry = offset, slot_expiry
+            self._write_slot(target if target is not None else victim, key_hash, current, expires_at, value)
+        return True
+
+    def delete(self, namespace: str, key):
+        key_hash = self._key_hash(namespace, key)
+        with self._locked():
+            for offset in self._slot_offsets(key_hash):
+                if _SLOT.unpack_from(self._mm, offset)[1] == key_hash:
+                    self._write_slot(offset, 0, 0, 0.0, b"")
+
+    def invalidate(self, namespace: str):
+        """Drop every entry in a namespace by bumping its version."""
+        offset = self._ns_offset(namespace)
+        with self._locked():
+            (current,) = _U32.unpack_from(self._mm, offset)
+            _U32.pack_into(self._mm, offset, (current + 1) & 0xFFFFFFFF)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
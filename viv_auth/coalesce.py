@@ -0,0 +1,45 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LoginCoalescer:
+    """Index of the most recent magic token issued per email, kept for a short window.
+
+    Backed by a bounded in-process LRU dict, or by a SharedMemoryCache
+    ("login" namespace) so every worker on the host sees the same entries.
+    Entries are only hints: callers still check the token row is valid.
+    """
+
+    def __init__(self, window_seconds: float, max_entries: int = 10000, cache=None):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.cache = cache
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> str | None:
+        """Return the token issued to email within the window, if any."""
+        if self.cache is not None:
+            record = self.cache.get("login", email)
+            return record["token"] if record else None
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            token, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[email]
+                return None
+            return token
+
+    def remember(self, email: str, token: str, ttl: float | None = None):
+        ttl = self.window_seconds if ttl is None else min(ttl, self.window_seconds)
+        if self.cache is not None:
+            self.cache.set("login", email, {"token": token}, ttl=ttl)
+            return
+        with self._lock:
+            self._entries[email] = (token, time.monotonic() + ttl)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -10,5 +10,18 @@ def _default_allow_signup() -> bool:
 class AuthConfig:
     token_expiry_minutes: int = 15
     session_max_age: int = 604800  # 7 days
+    session_codec: str = "itsdangerous"  # or "compact" (binary payload, shorter cookie)
+    legacy_session_cutoff: float | None = None  # Epoch seconds after which cookies without a key id are refused
     allow_signup: bool = field(default_factory=_default_allow_signup)
     require_active: bool = True
+    lazy_user: bool = False  # require_auth returns a UserProxy (id only, rest on demand)
+    login_coalesce_window: int = 0  # Seconds to reuse an outstanding magic token per email (0 = off)
+    login_coalesce_resend: bool = False  # Re-send the reused link instead of suppressing the email
+    warm_up_connections: int = 0  # Pool connections to open + compile auth statements in init_auth
+    replica_fallback: str = "recent"  # Retry replica misses on the primary: "recent" writes only, or "always"
+    replica_lag_seconds: float = 10.0  # How long a write counts as recent (should exceed replication lag)
+    magic_link_mode: str = "db"  # "db" (magic_tokens rows) or "signed" (stateless, see SignedMagicLinks)
+    allowed_domains: tuple[str, ...] = ()  # Email domains allowed to log in ("*.corp.com" = any subdomain)
+    blocked_domains: tuple[str, ...] = ()  # Email domains refused; block wins over an equal allow
+    domain_policy_file: str | None = None  # "allow x" / "block y" lines, reloaded when it changes
+    domain_policy_reload_seconds: float = 5.0  # Minimum interval between policy file mtime checks
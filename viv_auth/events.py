@@ -0,0 +1,186 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, insert
+
+logger = logging.getLogger("viv_auth")
+
+LOGIN_REQUESTED = "login_requested"
+TOKEN_VERIFIED = "token_verified"
+API_KEY_USED = "api_key_used"
+AUTH_FAILED = "auth_failed"
+
+EVENT_TYPES = (LOGIN_REQUESTED, TOKEN_VERIFIED, API_KEY_USED, AUTH_FAILED)
+
+
+@dataclass(slots=True)
+class AuthEvent:
+    type: str
+    ts: float
+    user_id: int | None = None
+    email: str | None = None
+    path: str | None = None
+    reason: str | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class NDJSONFileSink:
+    """Append events to a newline-delimited JSON file, rotating by size.
+
+    Rotated files are renamed path.1, path.2, ... up to backup_count.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self._fh.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def write(self, events: list[AuthEvent]):
+        self._fh.write("".join(json.dumps(e.to_dict(), separators=(",", ":")) + "\n" for e in events))
+        self._fh.flush()
+        if self.max_bytes and self._fh.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        self._fh.close()
+
+
+class DBSink:
+    """Bulk-insert events into an auth_events table (created if missing)."""
+
+    def __init__(self, engine, table_name: str = "auth_events"):
+        self.engine = engine
+        metadata = MetaData()
+        self.table = Table(
+            table_name,
+            metadata,
+            Column("id", Integer, primary_key=True),
+            Column("type", String(32), nullable=False, index=True),
+            Column("ts", Float, nullable=False),
+            Column("user_id", Integer, nullable=True),
+            Column("email", String, nullable=True),
+            Column("path", String, nullable=True),
+            Column("reason", String, nullable=True),
+        )
+        metadata.create_all(bind=engine)
+
+    def write(self, events: list[AuthEvent]):
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.table), [e.to_dict() for e in events])
+
+    def close(self):
+        pass
+
+
+class CallbackSink:
+    """Hand each drained batch to a callable."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, events: list[AuthEvent]):
+        self.callback(events)
+
+    def close(self):
+        pass
+
+
+class AuthEventStream:
+    """Bounded ring buffer of auth events, drained in batches by a background thread.
+
+    emit() only appends to a deque, so the request path never touches a sink.
+    When the buffer is full the oldest events are overwritten and counted in
+    `dropped`.
+    """
+
+    def __init__(
+        self,
+        sinks,
+        capacity: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.sinks = list(sinks)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._buffer: deque[AuthEvent] = deque(maxlen=capacity)
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._drain_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def emit(self, type: str, **fields):
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+        self._buffer.append(AuthEvent(type, time.time(), **fields))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="viv-auth-events", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the drain thread, flush what's buffered, and close sinks."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+    def flush(self):
+        """Drain the buffer synchronously."""
+        with self._drain_lock:
+            while self._buffer:
+                self._drain_batch()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _drain_batch(self):
+        batch = []
+        buffer = self._buffer
+        try:
+            while len(batch) < self.batch_size:
+                batch.append(buffer.popleft())
+        except IndexError:
+            pass
+        if not batch:
+            return
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e:
+                logger.error(f"[viv-auth] Event sink {type(sink).__name__} failed: {e}")
@@ -3,7 +3,14 @@ import logging
 import os
 from datetime import datetime, timezone
 
-from fastapi import Request
+from fastapi import Request, Response
+from starlette.requests import HTTPConnection
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from .events import API_KEY_USED, AUTH_FAILED
+from .queries import AuthQueries
+from .tracing import NULL_TRACE, NULL_TRACER
 
 logger = logging.getLogger("viv_auth")
 
@@ -15,35 +22,119 @@ class NotAuthenticated(Exception):
     pass
 
 
-def _check_api_token(request: Request) -> bool:
+class UserProxy:
+    """Lightweight stand-in for a User row returned by require_auth in lazy mode.
+
+    `id` is available immediately (it comes from the session token). Any other
+    column is served from the preloaded values, or triggers a single load of
+    the full row on first access. Raises NotAuthenticated if the row is gone.
+    """
+
+    __slots__ = ("id", "_loader", "_values", "_complete")
+
+    def __init__(self, id: int, loader, values: dict | None = None, complete: bool = False):
+        self.id = id
+        self._loader = loader
+        self._values = values or {}
+        self._complete = complete
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._values and not self._complete:
+            values = self._loader(self.id)
+            if values is None:
+                raise NotAuthenticated()
+            self._values = values
+            self._complete = True
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f"<UserProxy id={self.id}>"
+
+
+def _user_columns(User) -> list[str]:
+    return [attr.key for attr in inspect(User).column_attrs]
+
+
+def _load_user_values(db, queries: AuthQueries, user_id: int, names: list[str]) -> dict | None:
+    """Load only the given columns of one user as a dict, or None if missing."""
+    row = db.execute(queries.user_columns(names), {"user_id": user_id}).first()
+    if row is None:
+        return None
+    return dict(zip(names, row))
+
+
+def _retry_on_primary(recent_writes, params: dict) -> bool:
+    return recent_writes is None or recent_writes.seen(params)
+
+
+def read_first(read_db, db, stmt, params: dict, recent_writes=None):
+    """Run a prebuilt ORM select on the read replica, retrying on the primary on a miss.
+
+    Replicas lag behind the primary, so a row created moments ago (signup, a
+    new API key) may only exist there; the retry gives read-your-writes for
+    new rows. With recent_writes (a RecentWrites), only misses whose params
+    were written recently are retried; without it every miss is. Without a
+    replica (read_db is None) this is just the primary.
+    """
+    if read_db is not None:
+        row = read_db.scalars(stmt, params).first()
+        if row is not None or not _retry_on_primary(recent_writes, params):
+            return row
+    return db.scalars(stmt, params).first()
+
+
+def _check_api_token(request: Request, trace=NULL_TRACE) -> bool:
     """Check if request has a valid GDEV_API_TOKEN Bearer token."""
     token = os.environ.get("GDEV_API_TOKEN")
+    trace.mark("env")
     if not token:
         return False
     auth_header = request.headers.get("authorization", "")
+    trace.mark("header")
     if auth_header.startswith("Bearer "):
         return auth_header[7:] == token
     return False
 
 
-def _get_or_create_api_user(db, User):
+def _get_or_create_api_user(db, User, read_db=None, queries: AuthQueries | None = None, recent_writes=None):
     """Get or create the system API user for token-based auth."""
-    user = db.query(User).filter(User.email == API_USER_EMAIL).first()
+    queries = queries or AuthQueries(User)
+    # Always confirm a miss on the primary: a replica miss here means an insert.
+    user = read_first(read_db, db, queries.user_by_email, {"email": API_USER_EMAIL})
     if not user:
         user = User(email=API_USER_EMAIL, is_active=True)
         db.add(user)
         db.commit()
         db.refresh(user)
+        if recent_writes is not None:
+            recent_writes.note(user_id=user.id, email=API_USER_EMAIL)
         logger.info("[viv-auth] Created API system user (api@system.local)")
     return user
 
 
-def _check_api_key_bearer(request, db, User, ApiKey):
+def _check_api_key_bearer(
+    request, db, User, ApiKey, from_values=None, cache=None, trace=NULL_TRACE, read_db=None, queries=None,
+    recent_writes=None,
+):
     """Check if request has a valid per-user API key Bearer token.
 
-    Returns User if valid, None otherwise.
+    Returns User if valid, None otherwise. With from_values, the loaded columns
+    are snapshotted and passed to it instead of refreshing the row after commit.
+
+    With a cache, a hit on both the key and its user skips the database
+    entirely, so last_used_at is only written on cache misses (at most once
+    per cache TTL per key).
+
+    With read_db, the key and user are looked up on the replica and only the
+    last_used_at update goes to the primary.
     """
     auth_header = request.headers.get("authorization", "")
+    trace.mark("header")
     if not auth_header.startswith("Bearer "):
         return None
 
@@ -52,69 +143,274 @@ def _check_api_key_bearer(request, db, User, ApiKey):
         return None
 
     key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
-    api_key = (
-        db.query(ApiKey)
-        .filter(ApiKey.key_hash == key_hash, ApiKey.revoked_at.is_(None))
-        .first()
-    )
+    trace.mark("sha256")
+
+    if cache is not None:
+        entry = cache.get("api_key", key_hash)
+        if entry is not None:
+            values = cache.get("user", entry["user_id"])
+            if values is not None:
+                trace.mark("cache")
+                return from_values(values) if values["is_active"] else None
+        trace.mark("cache")
+
+    queries = queries or AuthQueries(User, ApiKey=ApiKey)
+    trace.checkout(read_db if read_db is not None else db)
+    api_key = read_first(read_db, db, queries.api_key_by_hash, {"key_hash": key_hash}, recent_writes)
+    trace.mark("query_api_key")
     if api_key is None:
         return None
 
-    user = db.query(User).filter(User.id == api_key.user_id).first()
+    user = read_first(read_db, db, queries.user_by_id, {"user_id": api_key.user_id}, recent_writes)
+    trace.mark("query_user")
     if user is None or not user.is_active:
         return None
 
     # Update last_used_at
-    api_key.last_used_at = datetime.now(timezone.utc)
+    db.execute(queries.touch_api_key, {"api_key_id": api_key.id, "now": datetime.now(timezone.utc)})
+
+    if from_values is not None:
+        values = {name: getattr(user, name) for name in _user_columns(User)}
+        db.commit()
+        trace.mark("commit")
+        if cache is not None:
+            cache.set("api_key", key_hash, {"user_id": user.id})
+            cache.set("user", user.id, values)
+        return from_values(values)
+
     db.commit()
+    trace.mark("commit")
 
     # Refresh user so attributes survive session close (commit expires objects)
-    db.refresh(user)
+    if user in db:
+        db.refresh(user)
+    trace.mark("refresh")
     return user
 
 
-def create_require_auth(get_db, User, session_manager, ApiKey=None):
-    """Factory that creates a require_auth FastAPI dependency."""
+def create_authenticator(
+    get_db, User, session_manager, ApiKey=None, events=None, config=None, cache=None, tracer=None,
+    get_read_db=None,
+    queries: AuthQueries | None = None,
+    recent_writes=None,
+):
+    """Factory for the auth chain shared by require_auth and AuthMiddleware.
+
+    The returned authenticate(conn) takes a Request or HTTPConnection and
+    returns the user, or raises NotAuthenticated.
+
+    With config.lazy_user, session-cookie auth returns a UserProxy without
+    touching the database. authenticate(conn, fields) instead loads those
+    columns eagerly in one narrow query; authenticate.eager_fields(names)
+    normalizes a field list and builds its select once.
+
+    With a cache (e.g. SharedMemoryCache), user rows and API key lookups are
+    served from it and populated on miss. Cached users come back as detached
+    User instances (or UserProxy in lazy mode).
+
+    An AuthTracer records per-phase timings under the name "require_auth".
+
+    With get_read_db (a read-replica session dependency), lookups go to the
+    replica and fall back to the primary on a miss (only for recently written
+    rows when recent_writes is given); writes stay on get_db.
+    """
+    from .config import AuthConfig
     from .session import COOKIE_NAME
 
-    async def require_auth(request: Request):
+    config = config or AuthConfig()
+    tracer = tracer or NULL_TRACER
+    queries = queries or AuthQueries(User, ApiKey=ApiKey)
+    lazy = config.lazy_user
+    all_fields = _user_columns(User)
+    # Build the full-row select up front so AuthQueries.warm_up() compiles it.
+    if lazy or cache is not None:
+        queries.user_columns(all_fields)
+
+    def eager_fields(names) -> tuple[str, ...]:
+        fields = ("id", *dict.fromkeys(name for name in names if name != "id"))
+        queries.user_columns(fields)  # raises AttributeError for unknown columns
+        return fields
+
+    def _load_full(user_id: int, trace=NULL_TRACE) -> dict | None:
+        if cache is not None:
+            values = cache.get("user", user_id)
+            trace.mark("cache")
+            if values is not None:
+                return values
+        values = _read_user_values(user_id, all_fields, trace)
+        if values is not None and cache is not None:
+            cache.set("user", user_id, values)
+        return values
+
+    def _read_user_values(user_id: int, names: list[str], trace=NULL_TRACE) -> dict | None:
+        if get_read_db is not None:
+            read_db = next(get_read_db())
+            try:
+                trace.checkout(read_db)
+                values = _load_user_values(read_db, queries, user_id, names)
+                trace.mark("query_user")
+            finally:
+                read_db.close()
+            if values is not None or not _retry_on_primary(recent_writes, {"user_id": user_id}):
+                return values
+        db = next(get_db())
+        try:
+            trace.checkout(db)
+            values = _load_user_values(db, queries, user_id, names)
+            trace.mark("query_user")
+        finally:
+            db.close()
+        return values
+
+    def _make_proxy(values: dict) -> UserProxy:
+        return UserProxy(values["id"], _load_full, values, complete=True)
+
+    def _make_detached(values: dict):
+        # Detached with an identity key, so db.add() + commit() is an UPDATE.
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    if lazy:
+        from_values = _make_proxy
+    elif cache is not None:
+        from_values = _make_detached
+    else:
+        from_values = None
+
+    def _fail(conn: HTTPConnection, reason: str):
+        if events is not None:
+            events.emit(AUTH_FAILED, path=conn.scope["path"], reason=reason)
+        raise NotAuthenticated()
+
+    def authenticate(conn: HTTPConnection, fields: tuple[str, ...] = ("id",)):
+        trace = tracer.start("require_auth")
+        try:
+            return _authenticate(conn, trace, fields)
+        finally:
+            trace.finish()
+
+    def _authenticate(conn: HTTPConnection, trace, fields):
         # 1. Check GDEV_API_TOKEN Bearer token (service-to-service)
-        if _check_api_token(request):
+        if _check_api_token(conn, trace):
             db = next(get_db())
+            read_db = next(get_read_db()) if get_read_db is not None else None
             try:
-                user = _get_or_create_api_user(db, User)
-                request.state.api_token_auth = True
+                user = _get_or_create_api_user(db, User, read_db, queries, recent_writes)
+                conn.state.api_token_auth = True
                 return user
             finally:
                 db.close()
+                if read_db is not None:
+                    read_db.close()
 
         # 2. Per-user API key (if enabled)
         if ApiKey is not None:
             db = next(get_db())
+            read_db = next(get_read_db()) if get_read_db is not None else None
             try:
-                user = _check_api_key_bearer(request, db, User, ApiKey)
+                user = _check_api_key_bearer(
+                    conn, db, User, ApiKey, from_values, cache, trace, read_db, queries,
+                    recent_writes=recent_writes,
+                )
                 if user:
-                    request.state.api_token_auth = True
+                    conn.state.api_token_auth = True
+                    if events is not None:
+                        events.emit(API_KEY_USED, user_id=user.id, path=conn.scope["path"])
                     return user
             finally:
                 db.close()
+                if read_db is not None:
+                    read_db.close()
 
         # 3. Fall back to session cookie
-        token = request.cookies.get(COOKIE_NAME)
+        token = conn.cookies.get(COOKIE_NAME)
+        trace.mark("cookie")
         if not token:
-            raise NotAuthenticated()
+            _fail(conn, "no_session")
 
-        user_id = session_manager.verify_session(token)
+        user_id, needs_reissue = session_manager.check_session(token)
+        trace.mark("unsign")
         if user_id is None:
-            raise NotAuthenticated()
+            _fail(conn, "invalid_session")
+        if needs_reissue:
+            conn.state.session_reissue = session_manager.create_session(user_id)
+
+        if lazy and len(fields) == 1:
+            return UserProxy(user_id, _load_full)
+
+        if cache is not None:
+            values = _load_full(user_id, trace)
+            if values is None:
+                _fail(conn, "unknown_user")
+            return from_values(values)
+
+        if lazy:
+            values = _read_user_values(user_id, fields, trace)
+            if values is None:
+                _fail(conn, "unknown_user")
+            return UserProxy(user_id, _load_full, values)
 
         db = next(get_db())
+        read_db = next(get_read_db()) if get_read_db is not None else None
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            trace.checkout(read_db if read_db is not None else db)
+            user = read_first(read_db, db, queries.user_by_id, {"user_id": user_id}, recent_writes)
+            trace.mark("query_user")
             if user is None:
-                raise NotAuthenticated()
+                _fail(conn, "unknown_user")
             return user
         finally:
             db.close()
+            if read_db is not None:
+                read_db.close()
+
+    authenticate.eager_fields = eager_fields
+    return authenticate
+
+
+def create_require_auth(get_db, User, session_manager, ApiKey=None, events=None, config=None, authenticate=None):
+    """Factory that creates a require_auth FastAPI dependency.
+
+    If AuthMiddleware already authenticated the request, its principal in
+    request.state.user is returned as-is.
+
+    Session cookies signed with a retired key are re-issued with the current
+    key on the dependency's response (applies when the endpoint doesn't
+    return its own Response object; AuthMiddleware re-issues unconditionally).
+
+    require_auth.with_fields("email", ...) returns a variant that, in lazy
+    mode, loads those columns eagerly in one query; plain require_auth stays
+    DB-free for session cookies. Variants are cached per field set. Outside
+    lazy mode (or after AuthMiddleware) it behaves like require_auth.
+    """
+    from .session import set_session_cookie
+
+    if authenticate is None:
+        authenticate = create_authenticator(get_db, User, session_manager, ApiKey, events, config)
+
+    def _dependency(fields: tuple[str, ...]):
+        async def require_auth(request: Request, response: Response):
+            user = getattr(request.state, "user", None)
+            if user is not None:
+                return user
+            user = authenticate(request, fields)
+            reissued = getattr(request.state, "session_reissue", None)
+            if reissued is not None:
+                set_session_cookie(response, session_manager, reissued)
+            return user
+
+        return require_auth
+
+    require_auth = _dependency(("id",))
+    variants = {("id",): require_auth}
+
+    def with_fields(*names: str):
+        fields = authenticate.eager_fields(names)
+        dependency = variants.get(fields)
+        if dependency is None:
+            dependency = variants[fields] = _dependency(fields)
+        return dependency
 
+    require_auth.with_fields = with_fields
     return require_auth
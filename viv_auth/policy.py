@@ -0,0 +1,127 @@
+import logging
+import os
+import time
+
+logger = logging.getLogger("viv_auth")
+
+ALLOW = "allow"
+BLOCK = "block"
+
+
+def _normalize(domain: str) -> str:
+    return domain.strip().lower().rstrip(".")
+
+
+def parse_rules(text: str) -> list[tuple[str, str]]:
+    """Parse a policy file: one "allow <pattern>" or "block <pattern>" per line, # comments."""
+    rules = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        action, _, pattern = line.partition(" ")
+        if action not in (ALLOW, BLOCK) or not pattern.strip():
+            raise ValueError(f"Invalid domain policy rule on line {lineno}: {line!r}")
+        rules.append((action, pattern))
+    return rules
+
+
+def compile_rules(rules) -> tuple[dict[str, str], dict[str, str], bool]:
+    """Compile (action, pattern) pairs into (exact, wildcard, has_allow).
+
+    "example.com" goes into `exact`; "*.example.com" goes into `wildcard`
+    keyed by "example.com" and matches any subdomain (not example.com itself).
+    If a pattern is both allowed and blocked, block wins.
+    """
+    exact: dict[str, str] = {}
+    wildcard: dict[str, str] = {}
+    has_allow = False
+    for action, pattern in rules:
+        pattern = _normalize(pattern)
+        table = exact
+        if pattern.startswith("*."):
+            pattern = pattern[2:]
+            table = wildcard
+        if not pattern or "*" in pattern or "@" in pattern:
+            raise ValueError(f"Invalid domain pattern {pattern!r}")
+        if table.get(pattern) != BLOCK:
+            table[pattern] = action
+        has_allow = has_allow or action == ALLOW
+    return exact, wildcard, has_allow
+
+
+class DomainPolicy:
+    """Email-domain allow/block rules, compiled once into hash tables.
+
+    The most specific matching rule decides: an exact domain beats any
+    wildcard, and a longer wildcard suffix beats a shorter one. A domain no
+    rule matches is allowed only if there are no allow rules. A check is one
+    dict lookup per label of the domain, independent of the number of rules.
+
+    With `path`, rules from that file are added to the static ones and
+    re-read when its mtime changes, checked at most every `reload_interval`
+    seconds. A file that fails to parse on reload is logged and ignored.
+    """
+
+    def __init__(self, allow=(), block=(), path: str | None = None, reload_interval: float = 5.0):
+        self._static = [(ALLOW, p) for p in allow] + [(BLOCK, p) for p in block]
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._next_check = time.monotonic() + reload_interval
+        file_rules = []
+        if path is not None:
+            self._mtime = os.stat(path).st_mtime_ns
+            with open(path) as f:
+                file_rules = parse_rules(f.read())
+        self._compiled = compile_rules(self._static + file_rules)
+
+    @classmethod
+    def from_config(cls, config) -> "DomainPolicy | None":
+        """Build the policy described by an AuthConfig, or None if it has no rules."""
+        if not (config.allowed_domains or config.blocked_domains or config.domain_policy_file):
+            return None
+        return cls(
+            config.allowed_domains,
+            config.blocked_domains,
+            path=config.domain_policy_file,
+            reload_interval=config.domain_policy_reload_seconds,
+        )
+
+    def allows(self, email: str) -> bool:
+        if self.path is not None:
+            self._maybe_reload()
+        exact, wildcard, has_allow = self._compiled
+        domain = _normalize(email.rpartition("@")[2])
+        action = exact.get(domain)
+        if action is None:
+            dot = domain.find(".")
+            while dot != -1:
+                action = wildcard.get(domain[dot + 1 :])
+                if action is not None:
+                    break
+                dot = domain.find(".", dot + 1)
+        if action is None:
+            return not has_allow
+        return action == ALLOW
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        # Don't retry (and re-log) the same broken file every interval.
+        self._mtime = mtime
+        try:
+            with open(self.path) as f:
+                self._compiled = compile_rules(self._static + parse_rules(f.read()))
+        except (OSError, ValueError) as exc:
+            logger.warning(f"[viv-auth] Keeping previous domain policy, reload of {self.path} failed: {exc}")
+            return
+        logger.info(f"[viv-auth] Reloaded domain policy from {self.path}")
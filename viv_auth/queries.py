@@ -0,0 +1,91 @@
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, select, update
+
+logger = logging.getLogger("viv_auth")
+
+
+class AuthQueries:
+    """Prebuilt statements for viv-auth's hot lookups.
+
+    Each statement is constructed once with bindparam() placeholders, so a
+    call only binds values: no Query object is rebuilt, the cache key is
+    memoized on the statement, and compilation is served from the engine's
+    compiled cache after the first execution.
+    """
+
+    def __init__(self, User, MagicToken=None, ApiKey=None):
+        self.User = User
+        self.user_by_id = select(User).where(User.id == bindparam("user_id"))
+        self.user_by_email = select(User).where(User.email == bindparam("email"))
+        self._user_columns: dict[tuple[str, ...], object] = {}
+
+        self.token_by_value = None
+        if MagicToken is not None:
+            self.token_by_value = select(MagicToken).where(MagicToken.token == bindparam("token"))
+
+        self.api_key_by_hash = self.touch_api_key = None
+        if ApiKey is not None:
+            self.api_key_by_hash = select(ApiKey).where(
+                ApiKey.key_hash == bindparam("key_hash"), ApiKey.revoked_at.is_(None)
+            )
+            self.touch_api_key = (
+                update(ApiKey)
+                .where(ApiKey.id == bindparam("api_key_id"))
+                .values(last_used_at=bindparam("now"))
+                .execution_options(synchronize_session=False)
+            )
+
+    def user_columns(self, names) -> object:
+        """select() of just these User columns by id, built once per column set."""
+        key = tuple(names)
+        stmt = self._user_columns.get(key)
+        if stmt is None:
+            stmt = select(*[getattr(self.User, name) for name in key]).where(
+                self.User.id == bindparam("user_id")
+            )
+            self._user_columns[key] = stmt
+        return stmt
+
+    def warm_up(self, get_dbs, connections: int = 1):
+        """Open pool connections and run each statement once per database.
+
+        get_dbs is a list of session dependencies, primary first (then any
+        replica). For each, `connections` connections are checked out at once
+        so the pool is filled, and every read statement, including the
+        user_columns() selects built so far, is executed with parameters that
+        match nothing so it is compiled and cached before real traffic. The
+        touch_api_key UPDATE is only warmed on the primary: replicas may be
+        read-only.
+        """
+        samples = [
+            (self.user_by_id, {"user_id": -1}),
+            (self.user_by_email, {"email": ""}),
+        ]
+        if self.token_by_value is not None:
+            samples.append((self.token_by_value, {"token": ""}))
+        if self.api_key_by_hash is not None:
+            samples.append((self.api_key_by_hash, {"key_hash": ""}))
+        samples += [(stmt, {"user_id": -1}) for stmt in self._user_columns.values()]
+
+        for index, get_db in enumerate(get_dbs):
+            db = next(get_db())
+            try:
+                for stmt, params in samples:
+                    db.execute(stmt, params).first()
+                if index == 0 and self.touch_api_key is not None:
+                    db.execute(self.touch_api_key, {"api_key_id": -1, "now": datetime.now(timezone.utc)})
+                    db.rollback()
+                engine = db.get_bind()
+            finally:
+                db.close()
+
+            held = []
+            try:
+                for _ in range(connections):
+                    held.append(engine.connect())
+            finally:
+                for conn in held:
+                    conn.close()
+        logger.info(f"[viv-auth] Warmed up {len(samples)} statements on {len(get_dbs)} database(s)")
@@ -0,0 +1,50 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecentWrites:
+    """Lookup parameters of rows written to the primary in the last `window` seconds.
+
+    read_first() retries a read-replica miss on the primary only when the
+    lookup's parameters were noted here (e.g. user_id / email of a fresh
+    signup, key_hash of a new API key), so unknown emails, bogus keys and
+    stale user ids cost one replica query and never reach the primary.
+
+    Backed by a bounded in-process LRU dict, or by a SharedMemoryCache
+    ("recent" namespace) so a write noted by one worker is seen by all
+    workers on the host.
+    """
+
+    def __init__(self, window_seconds: float, max_entries: int = 10000, cache=None):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.cache = cache
+        self._entries: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(params: dict) -> list[str]:
+        return [f"{name}={value}" for name, value in params.items()]
+
+    def note(self, **params):
+        """Record written identifiers, e.g. note(user_id=user.id, email=user.email)."""
+        if self.cache is not None:
+            for key in self._keys(params):
+                self.cache.set("recent", key, {"w": True}, ttl=self.window_seconds)
+            return
+        expires_at = time.monotonic() + self.window_seconds
+        with self._lock:
+            for key in self._keys(params):
+                self._entries[key] = expires_at
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def seen(self, params: dict) -> bool:
+        """True if any of these lookup parameters was noted within the window."""
+        if self.cache is not None:
+            return any(self.cache.get("recent", key) is not None for key in self._keys(params))
+        now = time.monotonic()
+        with self._lock:
+            return any(self._entries.get(key, 0.0) > now for key in self._keys(params))
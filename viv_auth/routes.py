@@ -6,9 +6,14 @@ from fastapi import APIRouter, Form, Request
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
+from .coalesce import LoginCoalescer
 from .config import AuthConfig
 from .email import send_magic_link
-from .session import COOKIE_NAME
+from .events import API_KEY_USED, AUTH_FAILED, LOGIN_REQUESTED, TOKEN_VERIFIED
+from .middleware import read_first
+from .queries import AuthQueries
+from .session import COOKIE_NAME, set_session_cookie
+from .tracing import NULL_TRACER
 
 TEMPLATES_DIR = Path(__file__).parent / "templates"
 
@@ -22,9 +27,35 @@ def create_auth_router(
     app_url: str | None = None,
     config: AuthConfig | None = None,
     ApiKey=None,
+    events=None,
+    tracer=None,
+    cache=None,
+    signed_links=None,
+    get_read_db=None,
+    queries: AuthQueries | None = None,
+    domain_policy=None,
+    recent_writes=None,
 ):
-    """Factory that creates an auth router with login, verify, logout routes."""
+    """Factory that creates an auth router with login, verify, logout routes.
+
+    With signed_links (a SignedMagicLinks), magic links are stateless signed
+    tokens instead of magic_tokens rows.
+
+    With get_read_db, user and API key lookups read from the replica and fall
+    back to the primary on a miss (only for rows in recent_writes, if given);
+    magic tokens and all writes use get_db.
+
+    With domain_policy (a DomainPolicy), login requests from disallowed email
+    domains are refused with 403 before any database access or email send.
+    """
     config = config or AuthConfig()
+    tracer = tracer or NULL_TRACER
+    queries = queries or AuthQueries(User, MagicToken, ApiKey)
+    coalescer = (
+        LoginCoalescer(config.login_coalesce_window, cache=cache)
+        if config.login_coalesce_window
+        else None
+    )
     templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
     router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -33,6 +64,39 @@ def create_auth_router(
             return app_url.rstrip("/")
         return str(request.base_url).rstrip("/")
 
+    def _emit(type: str, **fields):
+        if events is not None:
+            events.emit(type, **fields)
+
+    def _read_db():
+        return next(get_read_db()) if get_read_db is not None else None
+
+    def _invalid_link(request: Request):
+        return templates.TemplateResponse(
+            request,
+            "auth/error.html",
+            {
+                "app_name": app_name,
+                "message": "This link is invalid or has expired.",
+            },
+            status_code=400,
+        )
+
+    def _coalesced_token(db, email: str, user_id: int) -> str | None:
+        """Token recently issued to this email that can still be redeemed, if any."""
+        existing = coalescer.get(email)
+        if existing is None:
+            return None
+        if signed_links is not None:
+            payload = signed_links.peek(existing)
+            if payload is None or payload[0] != user_id or signed_links.nonce_store.is_consumed(payload[1]):
+                return None
+            return existing
+        magic_token = db.scalars(queries.token_by_value, {"token": existing}).first()
+        if magic_token is None or magic_token.user_id != user_id or not magic_token.is_valid():
+            return None
+        return existing
+
     @router.get("/login", response_class=HTMLResponse)
     async def login_page(request: Request, error: str | None = None):
         return templates.TemplateResponse(
@@ -47,12 +111,34 @@ def create_auth_router(
 
     @router.post("/login", response_class=HTMLResponse)
     async def login_submit(request: Request, email: str = Form(...)):
-        db = next(get_db())
+        trace = tracer.start("login_submit")
+        db = read_db = None
         try:
-            user = db.query(User).filter(User.email == email).first()
+            if domain_policy is not None:
+                allowed = domain_policy.allows(email)
+                trace.mark("domain_policy")
+                if not allowed:
+                    _emit(AUTH_FAILED, email=email, path=request.url.path, reason="domain_not_allowed")
+                    return templates.TemplateResponse(
+                        request,
+                        "auth/error.html",
+                        {"app_name": app_name, "message": "Sign-in is not available for this email domain."},
+                        status_code=403,
+                    )
+            db = next(get_db())
+            read_db = _read_db()
+            trace.checkout(read_db if read_db is not None else db)
+            # With signup on, a miss leads to an INSERT, so it is always
+            # confirmed on the primary.
+            user = read_first(
+                read_db, db, queries.user_by_email, {"email": email},
+                None if config.allow_signup else recent_writes,
+            )
+            trace.mark("query_user")
 
             if user is None:
                 if not config.allow_signup:
+                    _emit(AUTH_FAILED, email=email, path=request.url.path, reason="signup_disabled")
                     return templates.TemplateResponse(
                         request,
                         "auth/error.html",
@@ -62,17 +148,50 @@ def create_auth_router(
                 db.add(user)
                 db.commit()
                 db.refresh(user)
+                if recent_writes is not None:
+                    recent_writes.note(user_id=user.id, email=email)
+                trace.mark("signup")
 
-            token = MagicToken.create(user.id, config.token_expiry_minutes)
-            db.add(token)
-            db.commit()
-            db.refresh(token)
+            token_value = None
+            if coalescer is not None:
+                token_value = _coalesced_token(db, email, user.id)
+                trace.mark("coalesce")
+            coalesced = token_value is not None
+
+            if not coalesced:
+                if signed_links is not None:
+                    token_value = signed_links.create(user.id)
+                    trace.mark("sign_token")
+                else:
+                    token = MagicToken.create(user.id, config.token_expiry_minutes)
+                    db.add(token)
+                    db.commit()
+                    db.refresh(token)
+                    token_value = token.token
+                    trace.mark("insert_token")
 
             base_url = _get_app_url(request)
-            magic_url = f"{base_url}/auth/verify?token={token.token}"
+            magic_url = f"{base_url}/auth/verify?token={token_value}"
 
-            from_email = os.environ.get("FROM_EMAIL")
-            send_magic_link(email, magic_url, app_name, from_email)
+            if coalesced and not config.login_coalesce_resend:
+                sent = True
+            else:
+                from_email = os.environ.get("FROM_EMAIL")
+                sent = send_magic_link(email, magic_url, app_name, from_email)
+                trace.mark("send_email")
+            # Only a token whose email went out may absorb retries; after a
+            # failed send the next submit must send again.
+            if sent and not coalesced and coalescer is not None:
+                coalescer.remember(email, token_value, config.token_expiry_minutes * 60)
+            _emit(
+                LOGIN_REQUESTED,
+                user_id=user.id,
+                email=email,
+                path=request.url.path,
+                reason="coalesced" if coalesced else None,
+            )
+            if not sent:
+                _emit(AUTH_FAILED, user_id=user.id, email=email, path=request.url.path, reason="email_send_failed")
 
             return templates.TemplateResponse(
                 request,
@@ -80,28 +199,40 @@ def create_auth_router(
                 {"app_name": app_name, "email": email},
             )
         finally:
-            db.close()
+            if db is not None:
+                db.close()
+            if read_db is not None:
+                read_db.close()
+            trace.finish()
 
     @router.get("/verify")
     async def verify_token(request: Request, token: str):
+        trace = tracer.start("verify_token")
         db = next(get_db())
+        read_db = _read_db()
         try:
-            magic_token = db.query(MagicToken).filter(MagicToken.token == token).first()
-
-            if magic_token is None or not magic_token.is_valid():
-                return templates.TemplateResponse(
-                    request,
-                    "auth/error.html",
-                    {
-                        "app_name": app_name,
-                        "message": "This link is invalid or has expired.",
-                    },
-                    status_code=400,
-                )
+            if signed_links is not None:
+                magic_token = None
+                payload = signed_links.peek(token)
+                trace.mark("unsign_token")
+                if payload is None:
+                    _emit(AUTH_FAILED, path=request.url.path, reason="invalid_token")
+                    return _invalid_link(request)
+                user_id, nonce = payload
+            else:
+                trace.checkout(db)
+                magic_token = db.scalars(queries.token_by_value, {"token": token}).first()
+                trace.mark("query_token")
+                if magic_token is None or not magic_token.is_valid():
+                    _emit(AUTH_FAILED, path=request.url.path, reason="invalid_token")
+                    return _invalid_link(request)
+                user_id = magic_token.user_id
 
             if config.require_active:
-                user = db.query(User).filter(User.id == magic_token.user_id).first()
+                user = read_first(read_db, db, queries.user_by_id, {"user_id": user_id}, recent_writes)
+                trace.mark("query_user")
                 if user and not user.is_active:
+                    _emit(AUTH_FAILED, user_id=user.id, path=request.url.path, reason="inactive_user")
                     return templates.TemplateResponse(
                         request,
                         "auth/error.html",
@@ -112,21 +243,28 @@ def create_auth_router(
                         status_code=403,
                     )
 
-            magic_token.used = True
-            db.commit()
+            if magic_token is not None:
+                magic_token.used = True
+                db.commit()
+                trace.mark("commit")
+            else:
+                redeemed = signed_links.redeem(nonce)
+                trace.mark("consume_nonce")
+                if not redeemed:
+                    _emit(AUTH_FAILED, user_id=user_id, path=request.url.path, reason="invalid_token")
+                    return _invalid_link(request)
+            _emit(TOKEN_VERIFIED, user_id=user_id, path=request.url.path)
 
-            session_token = session_manager.create_session(magic_token.user_id)
+            session_token = session_manager.create_session(user_id)
+            trace.mark("sign_session")
             response = RedirectResponse(url="/", status_code=303)
-            response.set_cookie(
-                key=COOKIE_NAME,
-                value=session_token,
-                max_age=session_manager.max_age,
-                httponly=True,
-                samesite="lax",
-            )
+            set_session_cookie(response, session_manager, session_token)
             return response
         finally:
             db.close()
+            if read_db is not None:
+                read_db.close()
+            trace.finish()
 
     @router.get("/logout")
     async def logout():
@@ -143,36 +281,40 @@ def create_auth_router(
             Accepts JSON {"api_key": "gbox_pk_..."} or form data api_key=gbox_pk_...
             Form submissions redirect to /. JSON requests return JSON.
             """
-            content_type = request.headers.get("content-type", "")
-            is_form = "application/x-www-form-urlencoded" in content_type
-            if "application/json" in content_type:
-                body = await request.json()
-                raw_key = body.get("api_key", "")
-            else:
-                form = await request.form()
-                raw_key = form.get("api_key", "")
+            trace = tracer.start("api_key_login")
+            db = read_db = None
+            try:
+                content_type = request.headers.get("content-type", "")
+                is_form = "application/x-www-form-urlencoded" in content_type
+                if "application/json" in content_type:
+                    body = await request.json()
+                    raw_key = body.get("api_key", "")
+                else:
+                    form = await request.form()
+                    raw_key = form.get("api_key", "")
+                trace.mark("parse_body")
 
-            if not raw_key:
-                if is_form:
-                    return RedirectResponse(
-                        url="/auth/login?error=API+key+is+required",
-                        status_code=303,
+                if not raw_key:
+                    if is_form:
+                        return RedirectResponse(
+                            url="/auth/login?error=API+key+is+required",
+                            status_code=303,
+                        )
+                    return JSONResponse(
+                        status_code=400,
+                        content={"detail": "api_key is required"},
                     )
-                return JSONResponse(
-                    status_code=400,
-                    content={"detail": "api_key is required"},
-                )
 
-            key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
+                key_hash = hashlib.sha256(raw_key.encode()).hexdigest()
+                trace.mark("sha256")
 
-            db = next(get_db())
-            try:
-                api_key = (
-                    db.query(ApiKey)
-                    .filter(ApiKey.key_hash == key_hash, ApiKey.revoked_at.is_(None))
-                    .first()
-                )
+                db = next(get_db())
+                read_db = _read_db()
+                trace.checkout(read_db if read_db is not None else db)
+                api_key = read_first(read_db, db, queries.api_key_by_hash, {"key_hash": key_hash}, recent_writes)
+                trace.mark("query_api_key")
                 if api_key is None:
+                    _emit(AUTH_FAILED, path=request.url.path, reason="invalid_api_key")
                     if is_form:
                         return RedirectResponse(
                             url="/auth/login?error=Invalid+or+revoked+API+key",
@@ -183,8 +325,10 @@ def create_auth_router(
                         content={"detail": "Invalid or revoked API key"},
                     )
 
-                user = db.query(User).filter(User.id == api_key.user_id).first()
+                user = read_first(read_db, db, queries.user_by_id, {"user_id": api_key.user_id}, recent_writes)
+                trace.mark("query_user")
                 if user is None or not user.is_active:
+                    _emit(AUTH_FAILED, user_id=api_key.user_id, path=request.url.path, reason="inactive_user")
                     if is_form:
                         return RedirectResponse(
                             url="/auth/login?error=User+not+found+or+inactive",
@@ -197,10 +341,14 @@ def create_auth_router(
 
                 from datetime import datetime, timezone
 
-                api_key.last_used_at = datetime.now(timezone.utc)
+                user_id = user.id
+                db.execute(queries.touch_api_key, {"api_key_id": api_key.id, "now": datetime.now(timezone.utc)})
                 db.commit()
+                trace.mark("commit")
 
-                session_token = session_manager.create_session(user.id)
+                session_token = session_manager.create_session(user_id)
+                trace.mark("sign_session")
+                _emit(API_KEY_USED, user_id=user_id, path=request.url.path)
 
                 if is_form:
                     response = RedirectResponse(url="/", status_code=303)
@@ -209,15 +357,13 @@ def create_auth_router(
                         status_code=200,
                         content={"detail": "Authenticated", "redirect": "/"},
                     )
-                response.set_cookie(
-                    key=COOKIE_NAME,
-                    value=session_token,
-                    max_age=session_manager.max_age,
-                    httponly=True,
-                    samesite="lax",
-                )
+                set_session_cookie(response, session_manager, session_token)
                 return response
             finally:
-                db.close()
+                if db is not None:
+                    db.close()
+                if read_db is not None:
+                    read_db.close()
+                trace.finish()
 
     return router
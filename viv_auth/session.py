@@ -1,21 +1,207 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import struct
+import time
+from dataclasses import dataclass
+
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 
 
 COOKIE_NAME = "viv_session"
 
 
+@dataclass
+class SessionKey:
+    """A session signing key. `kid` is embedded in every cookie it signs.
+
+    The signing key is the one with the latest active_from that has passed,
+    so a new key can be scheduled ahead of time. Cookies signed by any other
+    known key still verify (and are flagged for re-issue) until the key's
+    expires_at, if set.
+    """
+
+    kid: str
+    secret: str
+    active_from: float = 0.0
+    expires_at: float | None = None
+
+    def __post_init__(self):
+        if not self.kid or "." in self.kid:
+            raise ValueError(f"Invalid session key id {self.kid!r}")
+
+
+def derive_kid(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()[:8]
+
+
+class CompactSessionCodec:
+    """Fixed-layout session payload for the one thing a session holds: a user id.
+
+    Layout: version (u8), user id (u64), issued-at seconds (u32), then the
+    first 16 bytes of an HMAC-SHA256 over those 13 bytes; base64url without
+    padding, 39 characters. No JSON, no compression, no separators.
+    """
+
+    VERSION = 1
+    MAC_SIZE = 16
+    _LAYOUT = struct.Struct(">BQI")
+    _TOKEN_SIZE = _LAYOUT.size + MAC_SIZE
+
+    def __init__(self, secret_key: str):
+        key = hashlib.sha256(b"viv-auth.compact-session." + secret_key.encode()).digest()
+        self._mac = hmac.new(key, digestmod=hashlib.sha256)
+
+    def _sign(self, payload: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(payload)
+        return mac.digest()[: self.MAC_SIZE]
+
+    def dumps(self, user_id: int) -> str:
+        payload = self._LAYOUT.pack(self.VERSION, user_id, int(time.time()))
+        return base64.urlsafe_b64encode(payload + self._sign(payload)).rstrip(b"=").decode()
+
+    def loads(self, token: str, max_age: int) -> int | None:
+        """Returns user_id if the token is authentic and younger than max_age."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (binascii.Error, ValueError):
+            return None
+        if len(raw) != self._TOKEN_SIZE:
+            return None
+        payload = raw[: self._LAYOUT.size]
+        if not hmac.compare_digest(raw[self._LAYOUT.size :], self._sign(payload)):
+            return None
+        version, user_id, issued_at = self._LAYOUT.unpack(payload)
+        if version != self.VERSION or time.time() - issued_at > max_age:
+            return None
+        return user_id
+
+
 class SessionManager:
-    def __init__(self, secret_key: str, max_age: int = 604800):
-        self.serializer = URLSafeTimedSerializer(secret_key)
+    """Signs and verifies session cookies of the form "<kid>.<signed payload>".
+
+    codec picks the payload format for new cookies: "itsdangerous" (JSON via
+    URLSafeTimedSerializer) or "compact" (CompactSessionCodec). Both formats
+    are always accepted, and cookies in the other format are flagged for
+    re-issue, so switching codec needs no logout.
+
+    Cookies issued before key ids ("<payload>.<ts>.<sig>") are accepted and
+    re-issued until legacy_cutoff (epoch seconds), or indefinitely if None.
+    """
+
+    def __init__(
+        self,
+        secret_key: str | None = None,
+        max_age: int = 604800,
+        keys: list[SessionKey] | None = None,
+        codec: str = "itsdangerous",
+        legacy_cutoff: float | None = None,
+    ):
+        if keys is None:
+            if secret_key is None:
+                raise ValueError("SessionManager needs secret_key or keys")
+            keys = [SessionKey(derive_kid(secret_key), secret_key)]
+        if codec not in ("itsdangerous", "compact"):
+            raise ValueError(f"Unknown session codec {codec!r} (expected 'itsdangerous' or 'compact')")
+        self.keys = {key.kid: key for key in keys}
+        self._serializers = {key.kid: URLSafeTimedSerializer(key.secret) for key in keys}
+        self._compact = {key.kid: CompactSessionCodec(key.secret) for key in keys}
+        self.codec = codec
         self.max_age = max_age
+        self.legacy_cutoff = legacy_cutoff
+        self._signing_kid = None
+        self._next_switch = 0.0
+
+    @classmethod
+    def from_secrets(
+        cls,
+        current: str,
+        previous: list[str] = (),
+        max_age: int = 604800,
+        codec: str = "itsdangerous",
+        legacy_cutoff: float | None = None,
+    ):
+        """Sign with `current`; keep accepting (and re-issuing) cookies signed with `previous`."""
+        keys = [SessionKey(derive_kid(current), current)]
+        keys += [SessionKey(derive_kid(secret), secret) for secret in previous if secret != current]
+        return cls(max_age=max_age, keys=keys, codec=codec, legacy_cutoff=legacy_cutoff)
+
+    @property
+    def serializer(self) -> URLSafeTimedSerializer:
+        return self._serializers[self.signing_kid()]
+
+    def signing_kid(self) -> str:
+        now = time.time()
+        if self._signing_kid is None or now >= self._next_switch:
+            active = [key for key in self.keys.values() if key.active_from <= now]
+            if not active:
+                raise ValueError("No session key is active yet")
+            self._signing_kid = max(active, key=lambda key: key.active_from).kid
+            pending = [key.active_from for key in self.keys.values() if key.active_from > now]
+            self._next_switch = min(pending, default=float("inf"))
+        return self._signing_kid
 
     def create_session(self, user_id: int) -> str:
-        return self.serializer.dumps({"user_id": user_id})
+        kid = self.signing_kid()
+        if self.codec == "compact":
+            return f"{kid}.{self._compact[kid].dumps(user_id)}"
+        return f"{kid}.{self._serializers[kid].dumps({'user_id': user_id})}"
+
+    def check_session(self, token: str) -> tuple[int | None, bool]:
+        """Returns (user_id, needs_reissue); user_id is None if the token is invalid.
+
+        needs_reissue is True when the cookie was signed by a key other than
+        the current signing key, uses the other codec, or predates key ids.
+        """
+        kid, _, signed = token.partition(".")
+        key = self.keys.get(kid)
+        if key is not None:
+            if key.expires_at is not None and time.time() >= key.expires_at:
+                return None, False
+            # itsdangerous payloads always contain dots; compact ones never do.
+            if "." in signed:
+                user_id = self._loads(self._serializers[kid], signed)
+                stale_codec = self.codec != "itsdangerous"
+            else:
+                user_id = self._compact[kid].loads(signed, self.max_age)
+                stale_codec = self.codec != "compact"
+            if user_id is None:
+                return None, False
+            return user_id, stale_codec or kid != self.signing_kid()
+
+        # Cookies issued before key ids: try each key without an expiry, but
+        # only for tokens shaped like one ("[.]payload.ts.sig"; the leading
+        # dot marks a compressed payload), so junk costs no HMACs at all.
+        if token.count(".") - token.startswith(".") != 2:
+            return None, False
+        if self.legacy_cutoff is not None and time.time() >= self.legacy_cutoff:
+            return None, False
+        for kid, serializer in self._serializers.items():
+            if self.keys[kid].expires_at is None:
+                user_id = self._loads(serializer, token)
+                if user_id is not None:
+                    return user_id, True
+        return None, False
 
     def verify_session(self, token: str) -> int | None:
         """Returns user_id if valid, None otherwise."""
+        return self.check_session(token)[0]
+
+    def _loads(self, serializer: URLSafeTimedSerializer, token: str) -> int | None:
         try:
-            data = self.serializer.loads(token, max_age=self.max_age)
+            data = serializer.loads(token, max_age=self.max_age)
             return data.get("user_id")
         except (BadSignature, SignatureExpired):
             return None
+
+
+def set_session_cookie(response, session_manager: SessionManager, session_token: str):
+    response.set_cookie(
+        key=COOKIE_NAME,
+        value=session_token,
+        max_age=session_manager.max_age,
+        httponly=True,
+        samesite="lax",
+    )
@@ -0,0 +1,101 @@
+import secrets
+import threading
+import time
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import Column, Float, MetaData, String, Table, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+
+class MemoryNonceStore:
+    """Consumed nonces in a dict, purged as they expire. Per process only."""
+
+    def __init__(self, purge_interval: float = 60.0):
+        self.purge_interval = purge_interval
+        self._expires: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_purge = time.monotonic() + purge_interval
+
+    def consume(self, nonce: str, ttl: float) -> bool:
+        """Mark nonce used; False if it already was."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_purge:
+                self._expires = {n: exp for n, exp in self._expires.items() if exp > now}
+                self._next_purge = now + self.purge_interval
+            expires_at = self._expires.get(nonce)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._expires[nonce] = now + ttl
+            return True
+
+    def is_consumed(self, nonce: str) -> bool:
+        expires_at = self._expires.get(nonce)
+        return expires_at is not None and expires_at > time.monotonic()
+
+
+class DBNonceStore:
+    """Consumed nonces in a table keyed by nonce; the primary key enforces single use."""
+
+    def __init__(self, engine, table_name: str = "consumed_nonces", purge_every: int = 1000):
+        self.engine = engine
+        self.purge_every = purge_every
+        self._count = 0
+        metadata = MetaData()
+        self.table = Table(
+            table_name,
+            metadata,
+            Column("nonce", String(32), primary_key=True),
+            Column("expires_at", Float, nullable=False, index=True),
+        )
+        metadata.create_all(bind=engine)
+
+    def consume(self, nonce: str, ttl: float) -> bool:
+        now = time.time()
+        self._count += 1
+        try:
+            with self.engine.begin() as conn:
+                if self._count % self.purge_every == 0:
+                    conn.execute(delete(self.table).where(self.table.c.expires_at <= now))
+                conn.execute(insert(self.table).values(nonce=nonce, expires_at=now + ttl))
+        except IntegrityError:
+            return False
+        return True
+
+    def is_consumed(self, nonce: str) -> bool:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(self.table.c.nonce).where(self.table.c.nonce == nonce)
+            ).first()
+        return row is not None
+
+
+class SignedMagicLinks:
+    """Stateless magic link tokens: a signed, timestamped {user id, nonce} payload.
+
+    Validation needs no database read; single use is enforced by recording
+    the nonce in `nonce_store` (anything with consume(nonce, ttl) -> bool and
+    is_consumed(nonce) -> bool) for the lifetime of the link. The store must
+    be shared by every process that redeems links: MemoryNonceStore is only
+    safe with a single worker.
+    """
+
+    def __init__(self, secret_key: str, max_age: int = 900, *, nonce_store):
+        self.serializer = URLSafeTimedSerializer(secret_key, salt="viv-auth-magic-link")
+        self.max_age = max_age
+        self.nonce_store = nonce_store
+
+    def create(self, user_id: int) -> str:
+        return self.serializer.dumps({"u": user_id, "n": secrets.token_urlsafe(12)})
+
+    def peek(self, token: str) -> tuple[int, str] | None:
+        """Returns (user_id, nonce) if the signature is valid and unexpired, else None."""
+        try:
+            data = self.serializer.loads(token, max_age=self.max_age)
+        except (BadSignature, SignatureExpired):
+            return None
+        return data.get("u"), data.get("n")
+
+    def redeem(self, nonce: str) -> bool:
+        """Consume a nonce obtained from peek(); False if it was already used."""
+        return self.nonce_store.consume(nonce, self.max_age)
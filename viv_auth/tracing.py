@@ -0,0 +1,103 @@
+import logging
+import random
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger("viv_auth")
+
+
+@dataclass
+class TraceReport:
+    name: str
+    total_ms: float
+    phases: list[tuple[str, float]]  # (phase, ms spent since the previous mark)
+    slow: bool
+
+    def format(self) -> str:
+        breakdown = ", ".join(f"{phase}={ms:.2f}ms" for phase, ms in self.phases)
+        return f"{self.name} took {self.total_ms:.2f}ms ({breakdown})"
+
+
+def _log_report(report: TraceReport):
+    if report.slow:
+        logger.warning(f"[viv-auth] Slow {report.format()}")
+    else:
+        logger.info(f"[viv-auth] Sampled {report.format()}")
+
+
+class Trace:
+    """Monotonic timestamps for the phases of one auth operation."""
+
+    __slots__ = ("tracer", "name", "start", "marks")
+
+    def __init__(self, tracer: "AuthTracer", name: str):
+        self.tracer = tracer
+        self.name = name
+        self.marks = []
+        self.start = time.perf_counter()
+
+    def mark(self, phase: str):
+        """Record the end of a phase."""
+        self.marks.append((phase, time.perf_counter()))
+
+    def checkout(self, db):
+        """Force the session's connection checkout so it is timed on its own."""
+        db.connection()
+        self.mark("checkout")
+
+    def finish(self):
+        end = time.perf_counter()
+        total_ms = (end - self.start) * 1000
+        slow = total_ms >= self.tracer.threshold_ms
+        if not slow and not (self.tracer.sample_rate and random.random() < self.tracer.sample_rate):
+            return
+        phases = []
+        previous = self.start
+        for phase, ts in self.marks:
+            phases.append((phase, (ts - previous) * 1000))
+            previous = ts
+        self.tracer.callback(TraceReport(self.name, total_ms, phases, slow))
+
+
+class _NullTrace:
+    __slots__ = ()
+
+    def mark(self, phase: str):
+        pass
+
+    def checkout(self, db):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class AuthTracer:
+    """Per-phase timing for require_auth, login, verify and API key login.
+
+    Operations slower than threshold_ms are reported with their full phase
+    breakdown through `callback` (default: a warning on the viv_auth logger).
+    sample_rate additionally reports that fraction of normal operations.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, sample_rate: float = 0.0, callback=None):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.callback = callback or _log_report
+
+    def start(self, name: str) -> Trace:
+        return Trace(self, name)
+
+
+class _NullTracer:
+    __slots__ = ()
+
+    def start(self, name: str) -> _NullTrace:
+        return NULL_TRACE
+
+
+# Used when tracing is disabled: every call is a no-op on a shared singleton.
+NULL_TRACER = _NullTracer()